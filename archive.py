@@ -0,0 +1,270 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+import db
+from search import search_messages
+
+# Archive partitions live next to the database in this directory, one file per month
+ARCHIVE_DIR = "archive"
+# Rows moved per transaction; keeps the write lock short so live chat writes only wait for one batch
+ARCHIVE_BATCH_SIZE = 500
+# Free pages handed back per incremental vacuum step
+VACUUM_STEP_PAGES = 256
+
+# Archive partitions use the same table and index names as the hot table, so the chat queries in db.py run unchanged
+# They carry their own full-text index too, so search.search_messages finds archived messages (rows are never updated or deleted)
+PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    sender TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp DATETIME,
+    conversation_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_key, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(message, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+END;
+"""
+
+OLDEST_MESSAGES_SQL = """
+SELECT id, sender, receiver, message, timestamp, conversation_key FROM messages
+ORDER BY id ASC
+LIMIT ?
+"""
+INSERT_ARCHIVED_SQL = "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?)"
+RECORD_PARTITION_SQL = """
+INSERT INTO message_archives (name, path, min_id, max_id, row_count) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET
+    min_id = MIN(min_id, excluded.min_id),
+    max_id = MAX(max_id, excluded.max_id),
+    row_count = row_count + excluded.row_count
+"""
+
+# Function to name the monthly partition a message timestamp belongs to
+def partition_name(timestamp):
+    return f"messages_{timestamp[:4]}_{timestamp[5:7]}"
+
+# Function to resolve a partition path stored in the catalog, relative to the main database
+def partition_path(db_file, path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_file)), path)
+
+# Function to open (and create if needed) an archive partition for writing
+def open_partition(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    indexed = conn.execute("SELECT 1 FROM sqlite_master WHERE name='messages_fts'").fetchone() is not None
+    conn.executescript(PARTITION_SCHEMA)
+    # Partitions written before archived messages were searchable get their index built once
+    if not indexed:
+        with conn:
+            conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+    return conn
+
+# Function to make sure every catalogued partition has its full-text index
+def index_partitions(db_file):
+    conn = db.connect(db_file)
+    try:
+        paths = [row[0] for row in conn.execute("SELECT path FROM message_archives")]
+    finally:
+        conn.close()
+    for path in paths:
+        open_partition(partition_path(db_file, path)).close()
+
+# Function to move messages older than older_than_days out of the hot table, a batch at a time
+def archive_messages(db_file, older_than_days, batch_size=ARCHIVE_BATCH_SIZE, pause=0.01):
+    # CURRENT_TIMESTAMP is UTC, so the cutoff is compared in UTC too
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = db.connect(db_file)
+    partitions = {}
+    moved = 0
+    try:
+        while True:
+            # Ids grow with time, so the messages to archive are always a prefix of the table by id
+            rows = []
+            for row in conn.execute(OLDEST_MESSAGES_SQL, (batch_size,)):
+                if row[4] is None or row[4] >= cutoff:
+                    break
+                rows.append(row)
+            if not rows:
+                break
+
+            # Copy into the partitions first; INSERT OR IGNORE makes a retry after a crash harmless
+            copied = []
+            for name, group in groupby(rows, key=lambda row: partition_name(row[4])):
+                group = list(group)
+                path = os.path.join(ARCHIVE_DIR, f"{name}.db")
+                if name not in partitions:
+                    partitions[name] = open_partition(partition_path(db_file, path))
+                with partitions[name]:
+                    inserted = partitions[name].executemany(INSERT_ARCHIVED_SQL, group).rowcount
+                copied.append((name, path, group[0][0], group[-1][0], inserted))
+
+            # Then drop them from the hot table and record the partitions in one short transaction
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM messages WHERE id<=?", (rows[-1][0],))
+                conn.executemany(RECORD_PARTITION_SQL, copied)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            moved += len(rows)
+            if len(rows) < batch_size:
+                break
+            # Give queued chat writes a chance to take the lock between batches
+            time.sleep(pause)
+    finally:
+        for partition in partitions.values():
+            partition.close()
+        conn.close()
+    return moved
+
+# Function to return free pages to the file system in small steps, without a blocking VACUUM
+def compact(db_file, step_pages=VACUUM_STEP_PAGES, pause=0.01):
+    conn = db.connect(db_file)
+    freed = 0
+    try:
+        # Incremental vacuum only works on databases created (or once vacuumed) with auto_vacuum=INCREMENTAL
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            while True:
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free_pages == 0:
+                    break
+                conn.execute(f"PRAGMA incremental_vacuum({step_pages})").fetchall()
+                freed += min(free_pages, step_pages)
+                time.sleep(pause)
+        # A passive checkpoint never waits for readers or writers
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    finally:
+        conn.close()
+    return freed
+
+# Function to switch an existing database to incremental vacuum; rewrites the file, so run it offline
+def enable_incremental_vacuum(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+# Read side of the archive: pages into the partitions only when asked for messages older than the hot table
+class ArchiveReader:
+    def __init__(self, db_file):
+        self.db_file = db_file
+        # path -> (read-only connection, lock); the lock serializes one partition's connection, not the whole archive
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    # Function to check whether anything has been archived yet
+    def has_partitions(self, conn):
+        return conn.execute("SELECT 1 FROM message_archives LIMIT 1").fetchone() is not None
+
+    # Function to get the next page of archived messages older than before_id, most recent first
+    def page(self, conn, key, before_id, limit):
+        partitions = conn.execute(
+            "SELECT path FROM message_archives WHERE min_id<? ORDER BY max_id DESC", (before_id,)
+        ).fetchall()
+        page = []
+        for (path,) in partitions:
+            page.extend(self._query(path, db.CHAT_PAGE_SQL, (key, before_id, limit - len(page))))
+            if len(page) == limit:
+                break
+        return page
+
+    # Function to search archived messages with the filters of search.search_messages, newest partitions first
+    def search(self, conn, text, limit=20, **filters):
+        partitions = conn.execute("SELECT path FROM message_archives ORDER BY max_id DESC").fetchall()
+        results = []
+        for (path,) in partitions:
+            if len(results) >= limit:
+                break
+            partition, lock = self._connect(path)
+            with lock:
+                try:
+                    results.extend(search_messages(partition, text, limit=limit - len(results), **filters))
+                except sqlite3.OperationalError:
+                    # Not indexed yet; the archiver indexes every partition on its next run
+                    continue
+        return results
+
+    def _query(self, path, sql, params):
+        partition, lock = self._connect(path)
+        with lock:
+            return partition.execute(sql, params).fetchall()
+
+    # Function to get the read-only connection to a partition and the lock that guards it
+    def _connect(self, path):
+        with self._lock:
+            partition = self._partitions.get(path)
+            if partition is None:
+                uri = f"file:{partition_path(self.db_file, path)}?mode=ro"
+                partition = (sqlite3.connect(uri, uri=True, check_same_thread=False), threading.Lock())
+                self._partitions[path] = partition
+            return partition
+
+    def close(self):
+        with self._lock:
+            for partition, lock in self._partitions.values():
+                with lock:
+                    partition.close()
+            self._partitions.clear()
+
+# Background thread that archives old messages and compacts the database on a fixed interval
+class ArchiveScheduler:
+    def __init__(self, db_file, older_than_days, interval_seconds):
+        self.db_file = db_file
+        self.older_than_days = older_than_days
+        self.interval_seconds = interval_seconds
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="message-archiver", daemon=True)
+        self._thread.start()
+
+    # Function to archive and compact once, returning (messages moved, pages freed)
+    def run_once(self):
+        index_partitions(self.db_file)
+        moved = archive_messages(self.db_file, self.older_than_days)
+        freed = compact(self.db_file)
+        self.last_run = (time.time(), moved, freed)
+        return moved, freed
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                print(f"Message archiving failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old chat messages into monthly archive partitions.")
+    parser.add_argument("database", nargs="?", default="healthcare.db")
+    parser.add_argument("--older-than-days", type=int, default=90)
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="One-off: rewrite the database so later compaction can run incrementally")
+    args = parser.parse_args()
+
+    conn = db.connect(args.database)
+    db.create_schema(conn)
+    conn.close()
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.database)
+    index_partitions(args.database)
+    moved = archive_messages(args.database, args.older_than_days)
+    freed = compact(args.database)
+    print(f"Archived {moved} messages; freed {freed} pages")
+
+if __name__ == "__main__":
+    main()
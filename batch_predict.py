@@ -0,0 +1,83 @@
+import argparse
+import numpy as np
+import pandas as pd
+import model_store
+from prescriptions import DATABASE, NO_PRESCRIPTION, read_formulary
+from symptoms import frame_to_sparse
+
+# Function to read a symptom file in fixed-size chunks so memory stays bounded
+def iter_chunks(input_path, symptom_columns, chunksize):
+    if input_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        dtypes = {column: "float32" for column in symptom_columns}
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=dtypes):
+            yield chunk
+
+# Function to score one chunk of symptom rows with a single vectorized call
+def score_chunk(pipeline, chunk, symptom_columns, formulary, top_k=3):
+    # Columns missing from the input are left as NaN and filled by the imputer
+    X = frame_to_sparse(chunk.reindex(columns=symptom_columns), symptom_columns)
+    probabilities = pipeline.predict_proba(X)
+    classes = pipeline.classes_
+
+    top_k = min(top_k, len(classes))
+    top_indices = np.argsort(-probabilities, axis=1)[:, :top_k]
+    top_probabilities = np.take_along_axis(probabilities, top_indices, axis=1)
+
+    # Keep identifying columns (ids, known prognosis, ...) next to the scores
+    passthrough = [c for c in chunk.columns if c not in symptom_columns and not c.startswith("Unnamed")]
+    result = chunk[passthrough].copy()
+    result["predicted_prognosis"] = classes[top_indices[:, 0]]
+    result["prescription"] = result["predicted_prognosis"].map(formulary).fillna(NO_PRESCRIPTION)
+    for rank in range(top_k):
+        result[f"top{rank + 1}_prognosis"] = classes[top_indices[:, rank]]
+        result[f"top{rank + 1}_probability"] = top_probabilities[:, rank]
+    return result
+
+# Function to score a whole CSV or Parquet file and write the predictions
+def predict_file(input_path, output_path, top_k=3, chunksize=50000, model=None, formulary=None):
+    if model is None:
+        model = model_store.load_or_train(model_store.TRAINING_DATA)
+    if formulary is None:
+        formulary = read_formulary()
+    pipeline = model["pipeline"]
+    symptom_columns = model["columns"]
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in iter_chunks(input_path, symptom_columns, chunksize):
+            result = score_chunk(pipeline, chunk, symptom_columns, formulary, top_k)
+            if output_path.endswith(".parquet"):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(result, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                result.to_csv(output_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+            rows += len(result)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a file of symptom rows laid out like Training.csv.")
+    parser.add_argument("input", help="CSV or Parquet file of symptom rows")
+    parser.add_argument("output", help="CSV or Parquet file to write predictions to")
+    parser.add_argument("--top-k", type=int, default=3, help="number of ranked prognoses to include per row")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows scored per vectorized batch")
+    parser.add_argument("--database", default=DATABASE, help="database holding the formulary")
+    args = parser.parse_args()
+
+    rows = predict_file(args.input, args.output, top_k=args.top_k, chunksize=args.chunksize, formulary=read_formulary(args.database))
+    print(f"Scored {rows} rows into {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import numpy as np
+import sklearn
+import dataset
+import model_store
+from symptoms import frame_to_sparse
+
+# Result sections holding latency summaries that are checked for slowdowns
+TIMING_SECTIONS = ("load", "train", "single_query", "batch")
+
+# Function to summarize latency samples in milliseconds
+def latency_summary(samples):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "mean_ms": float(samples_ms.mean()),
+    }
+
+# Function to time a callable several times and return the individual durations
+def time_calls(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+# Function to get the peak resident set size of this process in megabytes
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+# Function to run every benchmark and collect the results
+def run_benchmark(training_path=model_store.TRAINING_DATA, testing_path=model_store.TESTING_DATA,
+                  repeats=20, queries=1000, batch_size=1024, top_k=3):
+    results = {"environment": {
+        "python": platform.python_version(),
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+    }}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = os.path.join(tmp_dir, "dataset")
+        artifact_path = os.path.join(tmp_dir, "model.joblib")
+
+        # Data loading: parsing the CSV text versus mapping the binary cache
+        csv_samples = time_calls(lambda: dataset.read_symptom_csv(training_path), repeats)
+        dataset.load_symptom_data(training_path, cache_dir)
+        cached_samples = time_calls(lambda: dataset.load_symptom_data(training_path, cache_dir), repeats)
+
+        # Training and artifact round trip
+        train_samples = time_calls(lambda: model_store.train_model(training_path, artifact_path), max(1, repeats // 5))
+        fingerprint = model_store.compute_fingerprint(training_path)
+        artifact_samples = time_calls(lambda: model_store.load_artifact(artifact_path, fingerprint), repeats)
+        model = model_store.load_artifact(artifact_path, fingerprint)
+
+    results["load"] = {
+        "csv_parse": latency_summary(csv_samples),
+        "cached": latency_summary(cached_samples),
+        "artifact": latency_summary(artifact_samples),
+    }
+    results["train"] = {"fit": latency_summary(train_samples)}
+
+    pipeline = model["pipeline"]
+    symptom_columns = model["columns"]
+    testing_data = dataset.read_symptom_csv(testing_path)
+    X_test = frame_to_sparse(testing_data, symptom_columns)
+    y_test = testing_data["prognosis"].astype(str).to_numpy()
+
+    # Single-query latency, cycling through the test rows
+    rows = [X_test[i] for i in range(X_test.shape[0])]
+    single_samples = []
+    for i in range(queries):
+        row = rows[i % len(rows)]
+        start = time.perf_counter()
+        pipeline.predict(row)
+        single_samples.append(time.perf_counter() - start)
+    results["single_query"] = latency_summary(single_samples)
+    results["single_query"]["throughput_rows_per_s"] = float(queries / sum(single_samples))
+
+    # Batched latency on test rows tiled up to the batch size
+    batch = X_test[np.arange(batch_size) % X_test.shape[0]]
+    batch_samples = time_calls(lambda: pipeline.predict(batch), repeats)
+    results["batch"] = latency_summary(batch_samples)
+    results["batch"]["batch_size"] = batch_size
+    results["batch"]["throughput_rows_per_s"] = float(batch_size / np.median(batch_samples))
+
+    # Accuracy on Testing.csv
+    probabilities = pipeline.predict_proba(X_test)
+    classes = pipeline.classes_
+    top_indices = np.argsort(-probabilities, axis=1)[:, :top_k]
+    top_k_hits = (classes[top_indices] == y_test[:, None]).any(axis=1)
+    results["accuracy"] = {
+        "top1": float((classes[top_indices[:, 0]] == y_test).mean()),
+        f"top{top_k}": float(top_k_hits.mean()),
+        "test_rows": int(len(y_test)),
+    }
+
+    results["memory"] = {"peak_rss_mb": peak_rss_mb()}
+    return results
+
+# Function to compare results against a baseline and list the regressions
+def compare(results, baseline, tolerance=0.2, accuracy_tolerance=0.0):
+    regressions = []
+    for section in TIMING_SECTIONS:
+        current_section = results.get(section, {})
+        baseline_section = baseline.get(section, {})
+        # Sections hold either a latency summary or a dict of named summaries
+        pairs = [(section, current_section, baseline_section)]
+        pairs += [(f"{section}.{name}", value, baseline_section.get(name, {}))
+                  for name, value in current_section.items() if isinstance(value, dict)]
+        for name, current, previous in pairs:
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                if metric in current and metric in previous and current[metric] > previous[metric] * (1 + tolerance):
+                    regressions.append(f"{name}.{metric}: {previous[metric]:.3f} -> {current[metric]:.3f}")
+    for metric, value in results.get("accuracy", {}).items():
+        previous = baseline.get("accuracy", {}).get(metric)
+        if metric != "test_rows" and previous is not None and value < previous - accuracy_tolerance:
+            regressions.append(f"accuracy.{metric}: {previous:.4f} -> {value:.4f}")
+    previous_rss = baseline.get("memory", {}).get("peak_rss_mb")
+    if previous_rss and results["memory"]["peak_rss_mb"] > previous_rss * (1 + tolerance):
+        regressions.append(f"memory.peak_rss_mb: {previous_rss:.1f} -> {results['memory']['peak_rss_mb']:.1f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data loading, training and inference of the prognosis model.")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="stored results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    results = run_benchmark(repeats=args.repeats, queries=args.queries, batch_size=args.batch_size)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    # Timings only compare on the machine that recorded them, so no baseline is shipped; a missing one fails loudly
+    # rather than letting the regression check silently never run
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, so nothing was checked for regressions. "
+              f"Run python benchmark.py --save-baseline on this machine first.", file=sys.stderr)
+        sys.exit(2)
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import numpy as np
+
+# Location of the compiled, dependency-free model
+COMPILED_MODEL = os.path.join("artifacts", "compiled_model")
+
+# Function to compile a fitted imputer + calibrated linear classifier pipeline into plain NumPy arrays
+def export_compiled(pipeline, symptom_columns, out_dir=COMPILED_MODEL, fingerprint=None):
+    imputer = pipeline.named_steps["imputer"]
+    calibrated = pipeline.named_steps["classifier"].calibrated_classifiers_[0]
+    classifier = calibrated.estimator
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "coef.npy"), np.ascontiguousarray(classifier.coef_, dtype=np.float32))
+    np.save(os.path.join(out_dir, "intercept.npy"), classifier.intercept_.astype(np.float32))
+    np.save(os.path.join(out_dir, "means.npy"), imputer.statistics_.astype(np.float32))
+    # One sigmoid per weight row maps its score to a probability: 1 / (1 + exp(a * score + b))
+    np.save(os.path.join(out_dir, "calibration.npy"), np.array(
+        [[calibrator.a_, calibrator.b_] for calibrator in calibrated.calibrators], dtype=np.float64,
+    ))
+    meta = {
+        "fingerprint": fingerprint,
+        "columns": list(symptom_columns),
+        "labels": [str(label) for label in classifier.classes_],
+    }
+    # Metadata is written last so an interrupted export is never loaded
+    tmp_path = os.path.join(out_dir, f"meta.json.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(out_dir, "meta.json"))
+
+# Scores symptom vectors with one matrix product against memory-mapped linear weights, then calibrates the scores
+class CompiledPredictor:
+    def __init__(self, path=COMPILED_MODEL):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.fingerprint = meta["fingerprint"]
+        self.columns = meta["columns"]
+        self.labels = np.array(meta["labels"], dtype=object)
+        self.coef = np.load(os.path.join(path, "coef.npy"), mmap_mode="r")
+        self.intercept = np.load(os.path.join(path, "intercept.npy"), mmap_mode="r")
+        self.means = np.load(os.path.join(path, "means.npy"), mmap_mode="r")
+        self.calibration = np.load(os.path.join(path, "calibration.npy"))
+
+    def _scores(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if np.isnan(X).any():
+            X = np.where(np.isnan(X), self.means, X)
+        return X @ self.coef.T + self.intercept
+
+    # Function to compute raw class scores for a (n_rows, n_symptoms) or (n_symptoms,) array
+    def decision_function(self, X):
+        return self._class_scores(self._scores(X))
+
+    # Function to score one patient from the column indices of their symptoms
+    def decision_from_indices(self, indices):
+        return self._class_scores(self._scores_from_indices(indices))
+
+    def _scores_from_indices(self, indices):
+        return self.coef[:, np.asarray(indices, dtype=np.intp)].sum(axis=1) + self.intercept
+
+    def _class_scores(self, scores):
+        if scores.shape[-1] == 1:
+            # Binary models store one weight row for the positive class
+            scores = np.concatenate([-scores, scores], axis=-1) / 2
+        return scores
+
+    # Function to turn raw scores into calibrated probabilities, as sklearn's CalibratedClassifierCV does
+    def _calibrate(self, scores):
+        a, b = self.calibration[:, 0], self.calibration[:, 1]
+        probabilities = 1 / (1 + np.exp(a * scores.astype(np.float64) + b))
+        if probabilities.shape[-1] == 1:
+            return np.concatenate([1 - probabilities, probabilities], axis=-1)
+        total = probabilities.sum(axis=-1, keepdims=True)
+        # Every sigmoid can underflow to zero for an unusual row; fall back to uniform like sklearn
+        return np.where(total > 0, probabilities / np.where(total > 0, total, 1), 1 / probabilities.shape[-1])
+
+    # Predictions follow the calibrated probabilities, whose per-class sigmoids can reorder the raw scores
+    def predict(self, X):
+        return self.labels[np.argmax(self.predict_proba(X), axis=-1)]
+
+    def predict_indices(self, indices):
+        return self.labels[int(np.argmax(self._calibrate(self._scores_from_indices(indices))))]
+
+    def predict_proba(self, X):
+        return self._calibrate(self._scores(X))
+
+# Function to check that the compiled predictor returns the same labels and probabilities as the sklearn pipeline
+def verify(pipeline, predictor, X, atol=1e-4):
+    expected = pipeline.predict(X)
+    dense = X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+    actual = predictor.predict(dense)
+    close = np.isclose(pipeline.predict_proba(X), predictor.predict_proba(dense), atol=atol).all(axis=1)
+    return [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b or not close[i]]
+
+def main():
+    import model_store
+    from symptoms import frame_to_sparse
+    model = model_store.load_or_train(model_store.TRAINING_DATA)
+    if not model_store.is_linear(model["pipeline"]):
+        print(f"The served {model['fingerprint']['model_choice']['estimator']} model is not linear and cannot be compiled; "
+              f"choose a linear model with model_selection.py to use the inference server")
+        sys.exit(1)
+    export_compiled(model["pipeline"], model["columns"], fingerprint=model["fingerprint"])
+    predictor = CompiledPredictor()
+
+    testing_data = model_store.load_data(model_store.TESTING_DATA)
+    X_test = frame_to_sparse(testing_data, model["columns"])
+    mismatches = verify(model["pipeline"], predictor, X_test)
+    if mismatches:
+        print(f"Compiled predictor disagrees with sklearn on {len(mismatches)} of {X_test.shape[0]} rows: {mismatches}")
+        sys.exit(1)
+    print(f"Compiled model written to {COMPILED_MODEL}; matches sklearn on all {X_test.shape[0]} Testing.csv rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Location of the binary cache of parsed symptom datasets
+DATASET_CACHE = os.path.join("artifacts", "dataset")
+
+# Function to read a symptom CSV with compact dtypes, skipping the trailing empty column
+def read_symptom_csv(file_path):
+    header = pd.read_csv(file_path, nrows=0).columns
+    columns = [column for column in header if not column.startswith("Unnamed")]
+    dtypes = {column: "uint8" for column in columns if column != "prognosis"}
+    dtypes["prognosis"] = "category"
+    return pd.read_csv(file_path, usecols=columns, dtype=dtypes)[columns]
+
+# Function to get the cache directory and source signature for a CSV file
+def _cache_location(file_path, cache_dir):
+    stat = os.stat(file_path)
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return os.path.join(cache_dir, name), signature
+
+# Function to write the symptom matrix, label codes and metadata to the cache
+def write_cache(data, path, signature):
+    os.makedirs(path, exist_ok=True)
+    symptom_columns = [column for column in data.columns if column != "prognosis"]
+    labels = data["prognosis"].cat
+    np.save(os.path.join(path, "symptoms.npy"), data[symptom_columns].to_numpy(dtype=np.uint8))
+    np.save(os.path.join(path, "labels.npy"), labels.codes.to_numpy(dtype=np.int16))
+    meta = {"source": signature, "columns": symptom_columns, "categories": list(labels.categories)}
+    # Metadata is written last so an interrupted write is never mistaken for a valid cache
+    tmp_path = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+# Function to map a cached dataset back into a DataFrame, returning None if it is missing or stale
+def read_cache(path, signature):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("source") != signature:
+        return None
+    symptoms = np.load(os.path.join(path, "symptoms.npy"), mmap_mode="r")
+    codes = np.load(os.path.join(path, "labels.npy"))
+    data = pd.DataFrame(symptoms, columns=meta["columns"], copy=False)
+    data["prognosis"] = pd.Categorical.from_codes(codes, categories=meta["categories"])
+    return data
+
+# Function to load a symptom dataset, parsing the CSV only when its cache is out of date
+def load_symptom_data(file_path, cache_dir=DATASET_CACHE):
+    path, signature = _cache_location(file_path, cache_dir)
+    data = read_cache(path, signature)
+    if data is None:
+        data = read_symptom_csv(file_path)
+        write_cache(data, path, signature)
+    return data
@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+import migrations
+
+# Hot queries, kept here so check_query_plans inspects exactly what the app runs
+CHAT_HISTORY_SQL = """
+SELECT id, sender, message, timestamp FROM messages
+WHERE conversation_key=?
+ORDER BY id ASC
+"""
+# Newest messages older than a given id, most recent first
+CHAT_PAGE_SQL = """
+SELECT id, sender, message, timestamp FROM messages
+WHERE conversation_key=? AND id<?
+ORDER BY id DESC
+LIMIT ?
+"""
+# Messages that arrived after the last one a session has seen
+CHAT_NEW_MESSAGES_SQL = """
+SELECT id, sender, message, timestamp FROM messages
+WHERE conversation_key=? AND id>?
+ORDER BY id ASC
+"""
+PRESCRIPTIONS_SQL = "SELECT * FROM prescriptions WHERE patient=?"
+LOGGED_IN_USERS_SQL = "SELECT username FROM users WHERE user_type=? AND is_logged_in=1"
+
+INSERT_MESSAGE_SQL = """
+INSERT INTO messages (sender, receiver, message, conversation_key)
+VALUES (?, ?, ?, ?)
+"""
+
+# Index each hot query is expected to use
+EXPECTED_PLANS = [
+    (CHAT_HISTORY_SQL, ("a",), "idx_messages_conversation_id"),
+    (CHAT_PAGE_SQL, ("a", 100, 50), "idx_messages_conversation_id"),
+    (CHAT_NEW_MESSAGES_SQL, ("a", 100), "idx_messages_conversation_id"),
+    (PRESCRIPTIONS_SQL, ("a",), "idx_prescriptions_patient"),
+    (LOGGED_IN_USERS_SQL, ("Doctor",), "idx_users_presence"),
+]
+
+# Function to open a connection configured for concurrent readers and one writer
+def connect(db_file, busy_timeout_ms=5000):
+    conn = sqlite3.connect(db_file, timeout=busy_timeout_ms / 1000, check_same_thread=False)
+    # Only takes effect on a new database; lets archive.compact free space without a blocking VACUUM
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    return conn
+
+# Function to bring the schema up to date
+def create_schema(conn):
+    migrations.migrate(conn)
+
+# Function to check the hot queries use their indexes, returning a list of problems
+def check_query_plans(conn):
+    problems = []
+    for sql, params, index in EXPECTED_PLANS:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        if not any(index in detail for detail in plan):
+            problems.append(f"{index} not used by {' '.join(sql.split())}: {plan}")
+        if any("TEMP B-TREE" in detail for detail in plan):
+            problems.append(f"Query sorts without an index: {' '.join(sql.split())}: {plan}")
+    return problems
+
+# Pool of long-lived connections shared by every session in the process
+# A thread that already holds a connection gets the same one back, so nested helpers never take a second slot
+class ConnectionPool:
+    def __init__(self, db_file, size=8, busy_timeout_ms=5000, acquire_timeout=10):
+        self.db_file = db_file
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # Schema setup and migrations run once, when the pool is created
+        conn = self.acquire()
+        try:
+            create_schema(conn)
+        finally:
+            self.release(conn)
+
+    # Function to borrow a connection, opening a new one only while the pool is below its size
+    # Raises sqlite3.OperationalError if none is returned within timeout seconds (acquire_timeout by default)
+    def acquire(self, timeout=None):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+        conn = self._borrow(self.acquire_timeout if timeout is None else timeout)
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def _borrow(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                conn = connect(self.db_file, self.busy_timeout_ms)
+                self._created += 1
+                return conn
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"No database connection free after {timeout} s; all {self.size} are in use")
+
+    # Function to return a borrowed connection, discarding any unfinished transaction
+    # Only the outermost release of a thread's connection hands it back to the pool
+    def release(self, conn):
+        if getattr(self._local, "conn", None) is conn:
+            self._local.depth -= 1
+            if self._local.depth > 0:
+                return
+            self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import numpy as np
+import model_store
+from compiled_model import CompiledPredictor, COMPILED_MODEL
+from prescriptions import DATABASE, NO_PRESCRIPTION, read_formulary
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Prognoses returned per query, most likely first, matching the app's differential diagnosis
+DIFFERENTIAL_SIZE = 5
+
+# Function to turn symptom names or column indices into column indices
+def resolve_symptoms(symptoms, symptom_index):
+    indices = []
+    for symptom in symptoms:
+        if isinstance(symptom, str):
+            if symptom not in symptom_index:
+                raise ValueError(f"Unknown symptom: {symptom}")
+            indices.append(symptom_index[symptom])
+        # bool is a subclass of int, so true/false would otherwise pass as indices 1 and 0
+        elif isinstance(symptom, int) and not isinstance(symptom, bool) and 0 <= symptom < len(symptom_index):
+            indices.append(symptom)
+        else:
+            raise ValueError(f"Invalid symptom: {symptom!r}")
+    return indices
+
+# Function to load the compiled model, refusing one exported for other training data or another serving choice
+def load_predictor(path=COMPILED_MODEL):
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        raise SystemExit(f"No compiled model at {path}; run python compiled_model.py (it needs a linear serving choice)")
+    predictor = CompiledPredictor(path)
+    if predictor.fingerprint != model_store.compute_fingerprint(model_store.TRAINING_DATA):
+        raise SystemExit(f"Compiled model at {path} does not match the training data and serving choice the app uses; "
+                         f"run python compiled_model.py to export it again")
+    return predictor
+
+# Collects concurrent requests and scores them together in one matrix product
+# Each request resolves to its DIFFERENTIAL_SIZE most likely (prognosis, probability) pairs
+class MicroBatcher:
+    def __init__(self, predictor, window_ms=5, max_batch_size=64, top_k=DIFFERENTIAL_SIZE):
+        self.predictor = predictor
+        self.top_k = min(top_k, len(predictor.labels))
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.requests = 0
+        self.batches = 0
+        self._queue = asyncio.Queue()
+
+    async def submit(self, indices):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((indices, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        X = np.zeros((len(batch), len(self.predictor.columns)), dtype=np.float32)
+        for row, (indices, _) in enumerate(batch):
+            X[row, indices] = 1
+        try:
+            probabilities = self.predictor.predict_proba(X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        top = np.argsort(-probabilities, axis=1)[:, :self.top_k]
+        for (_, future), row_top, row_probabilities in zip(batch, top, probabilities):
+            if not future.done():
+                future.set_result([(str(self.predictor.labels[i]), float(row_probabilities[i])) for i in row_top])
+        self.requests += len(batch)
+        self.batches += 1
+
+# Minimal HTTP/1.1 JSON server in front of the micro-batcher
+class InferenceServer:
+    def __init__(self, predictor, formulary, window_ms=5, max_batch_size=64):
+        self.predictor = predictor
+        self.formulary = formulary
+        self.symptom_index = {symptom: index for index, symptom in enumerate(predictor.columns)}
+        self.batcher = MicroBatcher(predictor, window_ms, max_batch_size)
+
+    async def route(self, method, path, body):
+        if method == "POST" and path == "/predict":
+            try:
+                payload = json.loads(body or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("Request body must be a JSON object")
+                symptoms = payload.get("symptoms", [])
+                if not isinstance(symptoms, list):
+                    raise ValueError("symptoms must be a list of symptom names or column indices")
+                indices = resolve_symptoms(symptoms, self.symptom_index)
+            except ValueError as e:
+                return "400 Bad Request", {"error": str(e)}
+            ranked = await self.batcher.submit(indices)
+            prognosis, probability = ranked[0]
+            return "200 OK", {
+                "prognosis": prognosis,
+                "probability": probability,
+                "prescription": self.formulary.get(prognosis, NO_PRESCRIPTION),
+                "differential": [{"prognosis": label, "probability": p} for label, p in ranked],
+            }
+        if method == "GET" and path == "/symptoms":
+            return "200 OK", {"symptoms": self.predictor.columns}
+        if method == "GET" and path == "/prognoses":
+            return "200 OK", {"prognoses": [str(label) for label in self.predictor.labels]}
+        if method == "GET" and path == "/health":
+            batches = self.batcher.batches
+            return "200 OK", {
+                "status": "ok",
+                "requests": self.batcher.requests,
+                "batches": batches,
+                "mean_batch_size": self.batcher.requests / batches if batches else 0.0,
+            }
+        return "404 Not Found", {"error": f"No route for {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address=DEFAULT_ADDRESS, ready=None):
+        batcher_task = asyncio.create_task(self.batcher.run())
+        if address.startswith("unix:"):
+            server = await asyncio.start_unix_server(self.handle_connection, path=address[len("unix:"):])
+        else:
+            host, port = address.rsplit(":", 1)
+            server = await asyncio.start_server(self.handle_connection, host, int(port))
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+# HTTP connection over a Unix domain socket
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=10):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+# Client for the inference server; keeps one persistent connection per thread
+class InferenceClient:
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=10):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, "connection", None) is None:
+            if self.address.startswith("unix:"):
+                self._local.connection = UnixHTTPConnection(self.address[len("unix:"):], self.timeout)
+            else:
+                host, port = self.address.rsplit(":", 1)
+                self._local.connection = http.client.HTTPConnection(host, int(port), timeout=self.timeout)
+        return self._local.connection
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read())
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+        if response.status != 200:
+            raise ValueError(data.get("error", f"HTTP {response.status}"))
+        return data
+
+    # Function to get the prognosis, its probability and prescription, and the ranked differential,
+    # for symptom names or column indices
+    def predict(self, symptoms):
+        return self._request("POST", "/predict", {"symptoms": [s if isinstance(s, str) else int(s) for s in symptoms]})
+
+    def symptoms(self):
+        return self._request("GET", "/symptoms")["symptoms"]
+
+    def prognoses(self):
+        return self._request("GET", "/prognoses")["prognoses"]
+
+    def health(self):
+        return self._request("GET", "/health")
+
+# Function to drive a running server with concurrent clients and report throughput and latency
+def drive(address=DEFAULT_ADDRESS, concurrency=32, requests=2000):
+    client = InferenceClient(address)
+    symptom_count = len(client.symptoms())
+    rng = np.random.default_rng(0)
+    queries = [rng.choice(symptom_count, size=rng.integers(1, 6), replace=False).tolist() for _ in range(requests)]
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(worker_queries):
+        samples = []
+        for query in worker_queries:
+            start = time.perf_counter()
+            client.predict(query)
+            samples.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(samples)
+
+    threads = [threading.Thread(target=worker, args=(queries[i::concurrency],)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "server": client.health(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local micro-batching inference server for the prognosis model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="run the server")
+    serve_parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port or unix:/path/to.sock")
+    serve_parser.add_argument("--model", default=COMPILED_MODEL, help="compiled model directory")
+    serve_parser.add_argument("--window-ms", type=float, default=5, help="how long to wait to fill a batch")
+    serve_parser.add_argument("--max-batch-size", type=int, default=64)
+    serve_parser.add_argument("--database", default=DATABASE, help="database holding the formulary")
+    drive_parser = subparsers.add_parser("drive", help="load a running server with concurrent clients")
+    drive_parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    drive_parser.add_argument("--concurrency", type=int, default=32)
+    drive_parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = InferenceServer(load_predictor(args.model), read_formulary(args.database), args.window_ms, args.max_batch_size)
+        print(f"Serving predictions on {args.address}")
+        asyncio.run(server.serve(args.address))
+    else:
+        print(json.dumps(drive(args.address, args.concurrency, args.requests), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from benchmark import latency_summary
+
+# Default share of each operation in the simulated traffic
+DEFAULT_MIX = {
+    "send_message": 40,
+    "get_chat_history": 25,
+    "get_logged_in_users": 15,
+    "login_user": 5,
+    "give_prescription": 8,
+    "update_prescription_status": 7,
+}
+ROLES = ("Doctor", "Patient", "Aasha Worker")
+PASSWORD = "load-test"
+# Sessions still running this long after the deadline are reported as hung (e.g. a pool deadlock) instead of waited on forever
+HANG_GRACE_SECONDS = 30
+
+# Stand-in for the streamlit module inside main.py: keeps every call working but records st.error per thread
+class ErrorRecorder:
+    def __init__(self, streamlit):
+        self._streamlit = streamlit
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._streamlit, name)
+
+    def error(self, message, *args, **kwargs):
+        self._local.error = str(message)
+
+    def success(self, *args, **kwargs):
+        pass
+
+    # Function to return and clear the error recorded by the current thread's last call
+    def take_error(self):
+        error = getattr(self._local, "error", None)
+        self._local.error = None
+        return error
+
+# Function to parse "send_message=40,get_chat_history=25" into a mix
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation {name}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+# Function to import main.py pointed at the load-test database
+def load_app(db_file):
+    import main as app
+    app.DATABASE = db_file
+    app.st = ErrorRecorder(app.st)
+    return app
+
+# Function to size the database file together with its write-ahead log
+def database_size(db_file):
+    return sum(os.path.getsize(path) for path in (db_file, f"{db_file}-wal") if os.path.exists(path))
+
+# Function to create the users and some prescriptions the simulated sessions work with
+def seed_database(db_file, users_per_role, prescriptions):
+    app = load_app(db_file)
+    users = {role: [f"{role.split()[0].lower()}{i}" for i in range(users_per_role)] for role in ROLES}
+    with app.get_database(db_file).connection() as conn:
+        for role, names in users.items():
+            for name in names:
+                app.insert_user(conn, name, PASSWORD, role)
+        for i in range(prescriptions):
+            app.give_prescription(conn, users["Doctor"][i % users_per_role], users["Patient"][i % users_per_role], f"seed {i}")
+    app.get_write_queue(db_file).flush()
+    return users
+
+# Function to run one simulated session: pick operations from the mix until the deadline
+def run_session(app, users, mix, prescriptions, deadline, seed):
+    rng = random.Random(seed)
+    role = rng.choice(ROLES)
+    username = rng.choice(users[role])
+    peers = [name for other_role, names in users.items() if other_role != role for name in names]
+    operations, weights = list(mix), list(mix.values())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    locked = defaultdict(int)
+
+    with app.get_database(app.DATABASE).connection() as conn:
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            start = time.perf_counter()
+            try:
+                if operation == "login_user":
+                    app.login_user(conn, username, PASSWORD)
+                elif operation == "send_message":
+                    app.send_message(conn, username, rng.choice(peers), f"load test message {rng.random()}")
+                elif operation == "get_chat_history":
+                    app.get_chat_history(conn, username, rng.choice(peers))
+                elif operation == "give_prescription":
+                    app.give_prescription(conn, rng.choice(users["Doctor"]), rng.choice(users["Patient"]), "load test prescription")
+                elif operation == "update_prescription_status":
+                    app.update_prescription_status(conn, rng.randint(1, prescriptions), rng.choice(["accepted", "rejected"]))
+                else:
+                    app.get_logged_in_users(conn, rng.choice(ROLES))
+                error = app.st.take_error()
+            except sqlite3.Error as e:
+                # Reads are not wrapped in main.py, so their errors surface here
+                error = str(e)
+            samples[operation].append(time.perf_counter() - start)
+            if error:
+                errors[operation] += 1
+                if "database is locked" in error:
+                    locked[operation] += 1
+    return samples, errors, locked
+
+# Function to run the sessions of one process on threads and merge their results
+def run_process(db_file, users, mix, prescriptions, threads, duration, seed):
+    app = load_app(db_file)
+    started = time.time()
+    deadline = time.perf_counter() + duration
+    results = []
+    workers = [
+        threading.Thread(target=lambda i=i: results.append(run_session(app, users, mix, prescriptions, deadline, seed * 1000 + i)),
+                         daemon=True)
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(max(0, deadline + HANG_GRACE_SECONDS - time.perf_counter()))
+    hung = sum(worker.is_alive() for worker in workers)
+    if hung:
+        raise RuntimeError(f"{hung} of {threads} simulated sessions still running {HANG_GRACE_SECONDS} s after the deadline")
+    app.get_write_queue(db_file).flush()
+    window = (started, time.time())
+
+    merged = (defaultdict(list), defaultdict(int), defaultdict(int))
+    for samples, errors, locked in results:
+        for operation, values in samples.items():
+            merged[0][operation].extend(values)
+        for operation, count in errors.items():
+            merged[1][operation] += count
+        for operation, count in locked.items():
+            merged[2][operation] += count
+    return tuple(dict(part) for part in merged) + (window,)
+
+# Function to run the whole load test against a fresh temporary database
+def run_load_test(processes=2, threads=8, duration=10, mix=DEFAULT_MIX, users_per_role=20, prescriptions=50):
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    db_file = os.path.join(work_dir, "healthcare.db")
+    try:
+        users = seed_database(db_file, users_per_role, prescriptions)
+        size_before = database_size(db_file)
+
+        # Separate processes each have their own pool and write queue, like separate app servers on one file
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes) as pool:
+            outcomes = pool.starmap(
+                run_process,
+                [(db_file, users, mix, prescriptions, threads, duration, seed) for seed in range(processes)],
+            )
+        # Throughput is measured over the load window only, not process start-up
+        elapsed = max(outcome[3][1] for outcome in outcomes) - min(outcome[3][0] for outcome in outcomes)
+        size_after = database_size(db_file)
+
+        operations = {}
+        total = total_errors = total_locked = 0
+        for operation in mix:
+            samples = [value for outcome in outcomes for value in outcome[0].get(operation, [])]
+            errors = sum(outcome[1].get(operation, 0) for outcome in outcomes)
+            locked = sum(outcome[2].get(operation, 0) for outcome in outcomes)
+            if not samples:
+                continue
+            operations[operation] = {
+                "count": len(samples),
+                "throughput_ops": len(samples) / elapsed,
+                "error_rate": errors / len(samples),
+                "locked_rate": locked / len(samples),
+                **latency_summary(samples),
+            }
+            total += len(samples)
+            total_errors += errors
+            total_locked += locked
+
+        return {
+            "processes": processes,
+            "threads_per_process": threads,
+            "duration_s": elapsed,
+            "mix": mix,
+            "operations": operations,
+            "total": {
+                "count": total,
+                "throughput_ops": total / elapsed,
+                "error_rate": total_errors / max(total, 1),
+                "locked_rate": total_locked / max(total, 1),
+            },
+            "database": {
+                "bytes_before": size_before,
+                "bytes_after": size_after,
+                "growth_bytes": size_after - size_before,
+            },
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the chat and prescription data functions of main.py with concurrent simulated users.")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="simulated users per process")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="operation weights, e.g. send_message=40,get_chat_history=25")
+    parser.add_argument("--users-per-role", type=int, default=20)
+    parser.add_argument("--output", help="also write the JSON results here")
+    args = parser.parse_args()
+
+    results = run_load_test(processes=args.processes, threads=args.threads, duration=args.duration,
+                            mix=args.mix, users_per_role=args.users_per_role)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,50 @@
 import streamlit as st
 import sqlite3
+import sys
+from datetime import timedelta
 import hashlib
+import json
+import db
+import metrics
+from archive import ArchiveReader, ArchiveScheduler
+from migrations import conversation_key
+from notifications import broker
+from online_learning import CONFIRM_CASE_SQL, PENDING_CASES_SQL
+from resources import (
+    DATABASE, METRICS_PORT, get_database, get_metrics_server, get_presence, get_prognoses, get_write_queue,
+    persist_login_status, send_heartbeat,
+)
+from search import search_messages, search_prescriptions
+from symptom_matcher import symptom_phrase
 from streamlit import session_state as state
 from streamlit_webrtc import webrtc_streamer, VideoProcessorBase, WebRtcMode
 
-# Global variables
-logged_in_users = []
+# Number of chat messages loaded per page
+CHAT_PAGE_SIZE = 50
 
-# Function to create a connection to SQLite database
-def create_connection(db_file):
-    conn = None
-    try:
-        conn = sqlite3.connect(db_file, check_same_thread=False)
-    except sqlite3.Error as e:
-        st.error(f"Error connecting to database: {e}")
-    return conn
-
-# Function to create tables in the database if they do not exist
-def create_tables(conn):
-    if conn is not None:
-        create_users_table = """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            user_type TEXT NOT NULL,
-            is_logged_in INTEGER DEFAULT 0
-        );
-        """
-        try:
-            c = conn.cursor()
-            c.execute(create_users_table)
-        except sqlite3.Error as e:
-            st.error(f"Error creating table: {e}")
-
-        create_messages_table = """
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sender TEXT NOT NULL,
-            receiver TEXT NOT NULL,
-            message TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-        try:
-            c = conn.cursor()
-            c.execute(create_messages_table)
-        except sqlite3.Error as e:
-            st.error(f"Error creating messages table: {e}")
-        
-        create_prescriptions_table = """
-        CREATE TABLE IF NOT EXISTS prescriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            doctor TEXT NOT NULL,
-            patient TEXT NOT NULL,
-            prescription TEXT NOT NULL,
-            status TEXT DEFAULT 'pending'
-        );
-        """
-        try:
-            c = conn.cursor()
-            c.execute(create_prescriptions_table)
-        except sqlite3.Error as e:
-            st.error(f"Error creating prescriptions table: {e}")
+# Messages older than MESSAGE_HOT_DAYS move to archive partitions; the archiver runs every ARCHIVE_INTERVAL_SECONDS
+MESSAGE_HOT_DAYS = 90
+ARCHIVE_INTERVAL_SECONDS = 3600
+
+# Search results shown per query, recent messages first and then archived ones
+SEARCH_LIMIT = 20
+
+# How often an open chat checks the in-memory broker for new messages (no database access when idle)
+CHAT_REFRESH_SECONDS = 1
+
+# Function to open the read side of the message archive once per process
+@st.cache_resource
+def get_archive(db_file):
+    return ArchiveReader(db_file)
+
+# Function to start the background message archiver once per process
+@st.cache_resource
+def get_archiver(db_file):
+    get_database(db_file)
+    return ArchiveScheduler(db_file, MESSAGE_HOT_DAYS, ARCHIVE_INTERVAL_SECONDS)
 
 # Function to insert user data into the database
+@metrics.timed("db_seconds")
 def insert_user(conn, username, password, user_type):
     hashed_password = hashlib.sha256(password.encode()).hexdigest()
     sql = """
@@ -72,20 +52,21 @@ def insert_user(conn, username, password, user_type):
     VALUES (?, ?, ?)
     """
     try:
-        cur = conn.cursor()
-        cur.execute(sql, (username, hashed_password, user_type))
-        conn.commit()
+        # Writes go through the shared write queue and are acknowledged once committed
+        get_write_queue(DATABASE).write(sql, (username, hashed_password, user_type))
         st.success("Registration successful. Please login.")
     except sqlite3.Error as e:
         st.error(f"Error inserting user: {e}")
 
 # Function to retrieve user data from the database
+@metrics.timed("db_seconds")
 def get_user(conn, username):
     cur = conn.cursor()
     cur.execute("SELECT * FROM users WHERE username=?", (username,))
     return cur.fetchone()
 
 # Function to check if a username already exists in the database
+@metrics.timed("db_seconds")
 def username_exists(conn, username):
     cur = conn.cursor()
     cur.execute("SELECT COUNT(*) FROM users WHERE username=?", (username,))
@@ -93,13 +74,14 @@ def username_exists(conn, username):
     return count > 0
 
 # Function to log in a user
+@metrics.timed("db_seconds")
 def login_user(conn, username, password):
     user = get_user(conn, username)
     if user:
         hashed_password = hashlib.sha256(password.encode()).hexdigest()
         if hashed_password == user[2]:
-            # Update user's login status in the database
-            update_login_status(conn, username, 1)
+            # Mark the user online; the presence registry persists the change
+            get_presence(DATABASE).heartbeat(username, user[3])
             return (username, user[3])  # Return tuple (username, user_type)
         else:
             st.error("Incorrect username or password.")
@@ -109,26 +91,22 @@ def login_user(conn, username, password):
 
 # Function to log out a user
 def logout_user(conn, username):
-    update_login_status(conn, username, 0)
-    global logged_in_users
-    logged_in_users = [user for user in logged_in_users if user[0] != username]
+    get_presence(DATABASE).remove(username)
 
 # Function to update user's login status in the database
+@metrics.timed("db_seconds")
 def update_login_status(conn, username, status):
-    try:
-        cur = conn.cursor()
-        cur.execute("UPDATE users SET is_logged_in=? WHERE username=?", (status, username))
-        conn.commit()
-    except sqlite3.Error as e:
-        st.error(f"Error updating login status: {e}")
+    persist_login_status(DATABASE, username, status)
 
 # Function to get all logged-in users of a specific type
+@metrics.timed("db_seconds")
 def get_logged_in_users(conn, user_type):
     cur = conn.cursor()
-    cur.execute("SELECT username FROM users WHERE user_type=? AND is_logged_in=1", (user_type,))
+    cur.execute(db.LOGGED_IN_USERS_SQL, (user_type,))
     return [row[0] for row in cur.fetchall()]
 
 # Function to get user type based on username
+@metrics.timed("db_seconds")
 def get_user_type(conn, username):
     cur = conn.cursor()
     cur.execute("SELECT user_type FROM users WHERE username=?", (username,))
@@ -138,63 +116,113 @@ def get_user_type(conn, username):
     return None
 
 # Function to send a message
+@metrics.timed("db_seconds")
 def send_message(conn, sender, receiver, message):
-    sql = """
-    INSERT INTO messages (sender, receiver, message)
-    VALUES (?, ?, ?)
-    """
     try:
-        cur = conn.cursor()
-        cur.execute(sql, (sender, receiver, message))
-        conn.commit()
+        get_write_queue(DATABASE).write(db.INSERT_MESSAGE_SQL, (sender, receiver, message, conversation_key(sender, receiver)))
+        broker.publish(conversation_key(sender, receiver))
         st.success(f"Message sent to {receiver}")
     except sqlite3.Error as e:
         st.error(f"Error sending message: {e}")
 
-# Function to retrieve chat history between two users
+# Function to send the same message to several users with one bulk insert
+@metrics.timed("db_seconds")
+def send_messages(conn, sender, receivers, message):
+    rows = [(sender, receiver, message, conversation_key(sender, receiver)) for receiver in receivers]
+    try:
+        get_write_queue(DATABASE).write_many(db.INSERT_MESSAGE_SQL, rows)
+        for receiver in receivers:
+            broker.publish(conversation_key(sender, receiver))
+        return True
+    except sqlite3.Error as e:
+        st.error(f"Error sending message: {e}")
+        return False
+
+# Function to retrieve the recent chat history between two users
+# Only the hot table is read; archived messages are reached by scrolling back with get_chat_page
+@metrics.timed("db_seconds")
 def get_chat_history(conn, user1, user2):
-    sql = """
-    SELECT sender, message, timestamp FROM messages
-    WHERE (sender=? AND receiver=?) OR (sender=? AND receiver=?)
-    ORDER BY timestamp ASC
-    """
+    key = conversation_key(user1, user2)
     try:
         cur = conn.cursor()
-        cur.execute(sql, (user1, user2, user2, user1))
+        cur.execute(db.CHAT_HISTORY_SQL, (key,))
+        return cur.fetchall()
+    except sqlite3.Error as e:
+        st.error(f"Error retrieving chat history: {e}")
+        return []
+
+# Function to retrieve one page of chat history, most recent first, older than before_id
+# The first page only reads the hot table; scrolling back continues into the archive once it runs out
+@metrics.timed("db_seconds")
+def get_chat_page(conn, user1, user2, before_id=None, limit=50):
+    key = conversation_key(user1, user2)
+    try:
+        cur = conn.cursor()
+        cur.execute(db.CHAT_PAGE_SQL, (key, sys.maxsize if before_id is None else before_id, limit))
+        page = cur.fetchall()
+        if before_id is not None and len(page) < limit:
+            oldest_id = page[-1][0] if page else before_id
+            page += get_archive(DATABASE).page(conn, key, oldest_id, limit - len(page))
+        return page
+    except sqlite3.Error as e:
+        st.error(f"Error retrieving chat history: {e}")
+        return []
+
+# Function to retrieve the messages newer than the last one already seen
+@metrics.timed("db_seconds")
+def get_new_messages(conn, user1, user2, after_id):
+    try:
+        cur = conn.cursor()
+        cur.execute(db.CHAT_NEW_MESSAGES_SQL, (conversation_key(user1, user2), after_id))
         return cur.fetchall()
     except sqlite3.Error as e:
         st.error(f"Error retrieving chat history: {e}")
         return []
 
 # Function to give a prescription
+@metrics.timed("db_seconds")
 def give_prescription(conn, doctor, patient, prescription):
     sql = """
-    INSERT INTO prescriptions (doctor, patient, prescription)
-    VALUES (?, ?, ?)
+    INSERT INTO prescriptions (doctor, patient, prescription, created_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
     """
     try:
-        cur = conn.cursor()
-        cur.execute(sql, (doctor, patient, prescription))
-        conn.commit()
+        get_write_queue(DATABASE).write(sql, (doctor, patient, prescription))
         st.success(f"Prescription given to {patient}")
     except sqlite3.Error as e:
         st.error(f"Error giving prescription: {e}")
 
 # Function to get prescriptions for a patient
+@metrics.timed("db_seconds")
 def get_prescriptions(conn, patient):
     cur = conn.cursor()
-    cur.execute("SELECT * FROM prescriptions WHERE patient=?", (patient,))
+    cur.execute(db.PRESCRIPTIONS_SQL, (patient,))
     return cur.fetchall()
 
 # Function to update prescription status
+@metrics.timed("db_seconds")
 def update_prescription_status(conn, prescription_id, status):
     try:
-        cur = conn.cursor()
-        cur.execute("UPDATE prescriptions SET status=? WHERE id=?", (status, prescription_id))
-        conn.commit()
+        get_write_queue(DATABASE).write("UPDATE prescriptions SET status=? WHERE id=?", (status, prescription_id))
     except sqlite3.Error as e:
         st.error(f"Error updating prescription status: {e}")
 
+# Function to get a patient's predicted cases that no doctor has confirmed yet, newest first
+@metrics.timed("db_seconds")
+def get_pending_cases(conn, patient):
+    cur = conn.cursor()
+    cur.execute(PENDING_CASES_SQL, (patient,))
+    return cur.fetchall()
+
+# Function to record the diagnosis a doctor confirmed for a case; the online learner picks it up
+@metrics.timed("db_seconds")
+def confirm_case(conn, doctor, case_id, diagnosis):
+    try:
+        get_write_queue(DATABASE).write(CONFIRM_CASE_SQL, (diagnosis, doctor, case_id))
+        st.success(f"Diagnosis confirmed: {diagnosis}")
+    except sqlite3.Error as e:
+        st.error(f"Error confirming diagnosis: {e}")
+
 # Define SessionState class
 class SessionState:
     def __init__(self, **kwargs):
@@ -208,20 +236,63 @@ class SessionState:
         return st.session_state[session_id]
 
 # Function to display chat history
-def display_chat_history(conn, user1, user2):
-    chat_history = get_chat_history(conn, user1, user2)
-    if chat_history:
+# Runs as a fragment that re-checks the broker every CHAT_REFRESH_SECONDS and queries only when notified
+# The rerun's connection cannot be passed in: timed fragment reruns replay their arguments after it went back to the pool.
+# Instead, inside a full rerun the pool hands back the connection run_app already holds on this thread,
+# and on its own reruns the fragment borrows one only when it has something to query.
+@st.fragment(run_every=CHAT_REFRESH_SECONDS)
+def display_chat_history(user1, user2):
+    # Messages already fetched by this session are kept in session state, oldest first
+    key = conversation_key(user1, user2)
+    history_key = f"chat_history_{key}"
+    if history_key not in state:
+        with get_database(DATABASE).connection() as conn:
+            subscription = broker.subscribe(key)
+            page = get_chat_page(conn, user1, user2, limit=CHAT_PAGE_SIZE)
+            has_older = len(page) == CHAT_PAGE_SIZE or get_archive(DATABASE).has_partitions(conn)
+        state[history_key] = {
+            "messages": page[::-1],
+            "has_older": has_older,
+            "subscription": subscription,
+        }
+    history = state[history_key]
+
+    # Only rows newer than the last one seen are fetched, and only after a publish
+    if history["subscription"].poll():
+        last_seen_id = history["messages"][-1][0] if history["messages"] else 0
+        with get_database(DATABASE).connection() as conn:
+            history["messages"].extend(get_new_messages(conn, user1, user2, last_seen_id))
+
+    # A conversation may have only archived messages, so the button is offered even when nothing is shown yet
+    if history["has_older"] and st.button("Load earlier messages"):
+        oldest_id = history["messages"][0][0] if history["messages"] else sys.maxsize
+        with get_database(DATABASE).connection() as conn:
+            older = get_chat_page(conn, user1, user2, before_id=oldest_id, limit=CHAT_PAGE_SIZE)
+        history["messages"][:0] = older[::-1]
+        history["has_older"] = len(older) == CHAT_PAGE_SIZE
+
+    if history["messages"]:
         st.subheader("Chat History")
-        displayed_messages = set()  # To keep track of displayed messages
-
-        for chat in chat_history:
-            message_key = f"{chat[0]}-{chat[1]}-{chat[2]}"  # Unique identifier for each message
-            if message_key not in displayed_messages:
-                st.write(f"{chat[0]}: {chat[1]} ({chat[2]})")
-                displayed_messages.add(message_key)
+        for chat in history["messages"]:
+            st.write(f"{chat[1]}: {chat[2]} ({chat[3]})")
     else:
         st.write("No chat history available.")
 
+# Function to let a doctor confirm or correct the diagnosis of each of the patient's pending predicted cases, newest first
+def display_case_review(conn, doctor, patient):
+    cases = get_pending_cases(conn, patient)
+    if not cases:
+        return
+    st.subheader("Confirm Diagnosis")
+    diagnoses = get_prognoses(DATABASE)
+    for case_id, symptoms, predicted, created_at in cases:
+        st.write(f"Symptoms reported {created_at}: {', '.join(symptom_phrase(symptom) for symptom in json.loads(symptoms))}")
+        st.write(f"Predicted disease: {predicted}")
+        index = diagnoses.index(predicted) if predicted in diagnoses else 0
+        diagnosis = st.selectbox("Confirmed diagnosis", diagnoses, index=index, key=f"diagnosis_{case_id}")
+        if st.button("Confirm Diagnosis", key=f"confirm_{case_id}"):
+            confirm_case(conn, doctor, case_id, diagnosis)
+
 # Function to display prescriptions
 def display_prescriptions(conn, patient):
     prescriptions = get_prescriptions(conn, patient)
@@ -241,13 +312,47 @@ def display_prescriptions(conn, patient):
             else:
                 st.write(f"Status: {prescription[4]}")
 
+# Function to display full-text search over the user's own messages and prescriptions
+def display_search(conn, username, user_type):
+    with st.expander("Search messages and prescriptions"):
+        query = st.text_input("Search for", key="search_query")
+        col1, col2 = st.columns(2)
+        since = col1.date_input("From", value=None, key="search_since")
+        until = col2.date_input("To", value=None, key="search_until")
+        if not query:
+            return
+        since = str(since) if since else None
+        until = str(until + timedelta(days=1)) if until else None
+
+        st.subheader("Messages")
+        messages = search_messages(conn, query, participant=username, since=since, until=until, limit=SEARCH_LIMIT)
+        # Archived messages keep their own index; they fill whatever the recent messages leave of the page
+        if len(messages) < SEARCH_LIMIT:
+            messages += get_archive(DATABASE).search(conn, query, limit=SEARCH_LIMIT - len(messages),
+                                                     participant=username, since=since, until=until)
+        for message in messages:
+            st.write(f"{message[1]} to {message[2]}: {message[3]} ({message[4]})")
+        if not messages:
+            st.write("No matching messages.")
+
+        if user_type in ("Doctor", "Patient"):
+            st.subheader("Prescriptions")
+            if user_type == "Doctor":
+                prescriptions = search_prescriptions(conn, query, doctor=username, since=since, until=until)
+            else:
+                prescriptions = search_prescriptions(conn, query, patient=username, since=since, until=until)
+            for prescription in prescriptions:
+                st.write(f"Dr. {prescription[1]} for {prescription[2]}: {prescription[3]} (status: {prescription[4]})")
+            if not prescriptions:
+                st.write("No matching prescriptions.")
+
 # Function to forward chat to Asha Worker
 def forward_chat_to_asha_worker(conn, patient, prescription_id):
-    asha_workers = get_logged_in_users(conn, "Aasha Worker")
+    asha_workers = get_presence(DATABASE).online("Aasha Worker")
     if asha_workers:
-        for asha_worker in asha_workers:
-            send_message(conn, "System", asha_worker, f"Patient {patient} needs assistance with prescription ID {prescription_id}.")
-        st.success("Chat forwarded to Asha Worker.")
+        message = f"Patient {patient} needs assistance with prescription ID {prescription_id}."
+        if send_messages(conn, "System", asha_workers, message):
+            st.success("Chat forwarded to Asha Worker.")
     else:
         st.error("No Asha Workers available to assist.")
 
@@ -356,19 +461,27 @@ def main():
         </style>
     """, unsafe_allow_html=True)
 
-    # Create or connect to the SQLite database
-    conn = create_connection("healthcare.db")
-    if conn is not None:
-        # Create necessary tables
-        create_tables(conn)
-    else:
-        st.error("Error: Could not connect to database.")
+    # Borrow a pooled connection for this rerun; it goes back to the pool even if the script stops early
+    try:
+        database = get_database(DATABASE)
+        get_archiver(DATABASE)
+        conn = database.acquire()
+    except sqlite3.Error as e:
+        st.error(f"Error connecting to database: {e}")
+        return
+    try:
+        run_app(conn)
+    finally:
+        database.release(conn)
 
+# Function to render the app for one rerun using a borrowed connection
+def run_app(conn):
     # Initialize Streamlit app
     st.title("WebRTC Video and Web Chat App")
 
     # Initialize SessionState
     session_state = SessionState.get(logged_in=False, username='', user_type='', chat_with='', chat_mode='')
+    presence = get_presence(DATABASE)
 
     # Sidebar menu
     menu = ["Home", "Login", "Register", "Logout"]
@@ -415,17 +528,21 @@ def main():
         else:
             st.warning("You are not logged in.")
 
+    # Heartbeat so this session stays in the online lists while the page is open
+    if session_state.logged_in:
+        send_heartbeat(DATABASE, session_state.username, session_state.user_type)
+
     # Display available Doctors and Asha Workers for logged-in Patients
     if session_state.logged_in and session_state.user_type == "Patient":
         st.sidebar.title("Available Doctors")
-        doctors = get_logged_in_users(conn, "Doctor")
+        doctors = presence.online("Doctor")
         if doctors:
             st.sidebar.write("\n".join(doctors))
         else:
             st.sidebar.write("No doctors available.")
 
         st.sidebar.title("Available Asha Workers")
-        asha_workers = get_logged_in_users(conn, "Aasha Worker")
+        asha_workers = presence.online("Aasha Worker")
         if asha_workers:
             st.sidebar.write("\n".join(asha_workers))
         else:
@@ -433,12 +550,12 @@ def main():
 
     # Display logged-in users by user type
     st.sidebar.title("Logged-in Users")
-    if logged_in_users:
-        for user_type in ["Doctor", "Patient", "Aasha Worker"]:
+    for user_type in ["Doctor", "Patient", "Aasha Worker"]:
+        online_users = presence.online(user_type)
+        if online_users:
             st.sidebar.subheader(user_type)
-            for user in logged_in_users:
-                if user[1] == user_type:
-                    st.sidebar.write(user[0])
+            for username in online_users:
+                st.sidebar.write(username)
 
     st.sidebar.title("About")
     st.sidebar.info(
@@ -448,20 +565,20 @@ def main():
     # Chat interface
     if session_state.logged_in:
 #        st.markdown("[disease Prognosis](human-disease-prediction_V3.py)")
-        st.markdown("[Click here for Disease Prognosis and Virtual Prescription](http://localhost:9000)")
+        st.page_link("pages/1_Disease_Prediction.py", label="Click here for Disease Prognosis and Virtual Prescription")
             
         st.subheader("Chat Interface")
         if session_state.user_type == "Doctor":
             st.info("Select a patient to chat with from the sidebar.")
-            selected_patient = st.sidebar.selectbox("Patients", get_logged_in_users(conn, "Patient"))
+            selected_patient = st.sidebar.selectbox("Patients", presence.online("Patient"))
             state.chat_with = selected_patient
         elif session_state.user_type == "Patient":
             st.info("Select a doctor or Aasha Worker to chat with from the sidebar.")
-            selected_user = st.sidebar.selectbox("Doctors/Aasha Workers", get_logged_in_users(conn, "Doctor") + get_logged_in_users(conn, "Aasha Worker"))
+            selected_user = st.sidebar.selectbox("Doctors/Aasha Workers", presence.online("Doctor") + presence.online("Aasha Worker"))
             state.chat_with = selected_user
         elif session_state.user_type == "Aasha Worker":
             st.info("Select a patient to chat with from the sidebar.")
-            selected_patient = st.sidebar.selectbox("Patients", get_logged_in_users(conn, "Patient"))
+            selected_patient = st.sidebar.selectbox("Patients", presence.online("Patient"))
             state.chat_with = selected_patient
 
         if state.chat_with:
@@ -470,7 +587,7 @@ def main():
             session_state.chat_mode = chat_mode
             
             if chat_mode == "Web Chat":
-                display_chat_history(conn, session_state.username, state.chat_with)
+                display_chat_history(session_state.username, state.chat_with)
                 message = st.text_input("Message:")
                 if st.button("Send"):
                     send_message(conn, session_state.username, state.chat_with, message)
@@ -478,6 +595,7 @@ def main():
                     prescription = st.text_area("Prescription:")
                     if st.button("Give Prescription"):
                         give_prescription(conn, session_state.username, state.chat_with, prescription)
+                    display_case_review(conn, session_state.username, state.chat_with)
                 elif session_state.user_type == "Patient":
                     display_prescriptions(conn, session_state.username)
             elif chat_mode == "Video Chat":
@@ -485,9 +603,9 @@ def main():
                 # Use webrtc_streamer to start video chat
                 webrtc_streamer(key="example", mode=WebRtcMode.SENDRECV)
 
-    # Disconnect from database
-    if conn is not None:
-        conn.close()
+        display_search(conn, session_state.username, session_state.user_type)
 
 if __name__ == "__main__":
-    main()
+    get_metrics_server(METRICS_PORT)
+    with metrics.rerun_timer("main"):
+        main()
@@ -0,0 +1,205 @@
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond queries to multi-second reruns
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Reruns slower than this many milliseconds are sampled by the profiler; unset or 0 disables it
+PROFILE_SLOW_RERUN_MS = float(os.environ.get("PROFILE_SLOW_RERUN_MS", "0"))
+# Interval between stack samples taken while a rerun is being profiled
+PROFILE_INTERVAL_SECONDS = 0.005
+
+# Cumulative latency histogram for one metric and label set
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+# In-process store of every histogram and collected value, rendered in the Prometheus text format
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._collected = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    # Function to record one duration under a metric name and labels
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    # Function to publish a value read at every scrape, e.g. a cache's hit count; kind is "counter" or "gauge"
+    # Registering the same name and labels again replaces the earlier reader
+    def collect(self, name, kind, read, **labels):
+        with self._lock:
+            self._collected[(name, tuple(sorted(labels.items())))] = (kind, read)
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    # Function to render every histogram as Prometheus exposition text
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for name in sorted({name for name, _ in self._histograms}):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in items:
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            collected = sorted(self._collected.items())
+        for name in sorted({name for (name, _), _ in collected}):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            series = [(labels, kind, read) for (metric, labels), (kind, read) in collected if metric == name]
+            lines.append(f"# TYPE {name} {series[0][1]}")
+            for labels, _, read in series:
+                lines.append(f"{name}{format_labels(labels)} {read()}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{escape_label(value)}"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Registry shared by everything in this process
+registry = MetricsRegistry()
+registry.describe("db_seconds", "Duration of database helper calls")
+registry.describe("model_seconds", "Duration of model load, fit and predict")
+registry.describe("speech_seconds", "Duration of speech recognition steps")
+registry.describe("rerun_seconds", "Duration of full Streamlit script reruns")
+registry.describe("prediction_cache_hits_total", "Differential diagnoses answered from the prediction cache")
+registry.describe("prediction_cache_misses_total", "Differential diagnoses that had to be ranked by the model")
+registry.describe("prediction_cache_entries", "Symptom patterns held in the prediction cache")
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, **labels)
+
+# Decorator to time every call of a function; the function name is recorded as a label
+def timed(name, **labels):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, function=func.__name__, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Sampling profiler: while active, counts the stacks of one thread every PROFILE_INTERVAL_SECONDS
+class StackSampler:
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                self.stacks[tuple(f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})" for entry in stack)] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+# Most recent slow-rerun profiles: (app, seconds, [(count, stack), ...]) with the hottest stacks first
+slow_reruns = collections.deque(maxlen=20)
+
+# Context manager for a whole rerun: records its duration and, when enabled, profiles it if it turns out slow
+@contextmanager
+def rerun_timer(app, slow_ms=None):
+    slow_ms = PROFILE_SLOW_RERUN_MS if slow_ms is None else slow_ms
+    sampler = StackSampler(threading.get_ident()) if slow_ms > 0 else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("rerun_seconds", seconds, app=app)
+        if sampler is not None:
+            stacks = sampler.stop()
+            if seconds * 1000 >= slow_ms:
+                slow_reruns.append((app, seconds, [(count, list(stack)) for stack, count in stacks.most_common(10)]))
+
+# Function to render the captured slow reruns as plain text
+def render_slow_reruns():
+    lines = []
+    for app, seconds, stacks in slow_reruns:
+        lines.append(f"{app}: {seconds * 1000:.1f} ms")
+        for count, stack in stacks:
+            lines.append(f"  {count} samples:")
+            lines.extend(f"    {entry}" for entry in stack)
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = registry.render()
+        elif self.path == "/slow":
+            body = render_slow_reruns()
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to serve /metrics (Prometheus text) and /slow (slow rerun profiles) on a background thread
+def start_server(port, host="127.0.0.1"):
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,196 @@
+import sqlite3
+import sys
+
+# Separator used to build conversation keys; it cannot appear in a typed username
+CONVERSATION_KEY_SEPARATOR = "\x1f"
+
+# Function to build the order-independent key shared by both directions of a conversation
+def conversation_key(user1, user2):
+    first, second = sorted((user1, user2))
+    return f"{first}{CONVERSATION_KEY_SEPARATOR}{second}"
+
+# Function to add a column unless an earlier (partial) run already added it
+def add_column(conn, table, column, definition):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def create_base_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password_hash TEXT NOT NULL,
+        user_type TEXT NOT NULL,
+        is_logged_in INTEGER DEFAULT 0
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender TEXT NOT NULL,
+        receiver TEXT NOT NULL,
+        message TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS prescriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doctor TEXT NOT NULL,
+        patient TEXT NOT NULL,
+        prescription TEXT NOT NULL,
+        status TEXT DEFAULT 'pending'
+    );
+    """)
+
+def add_conversation_key(conn):
+    add_column(conn, "messages", "conversation_key", "TEXT")
+    conn.execute(
+        "UPDATE messages SET conversation_key = CASE WHEN sender < receiver "
+        "THEN sender || char(31) || receiver ELSE receiver || char(31) || sender END "
+        "WHERE conversation_key IS NULL"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_key, timestamp)")
+
+def add_lookup_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_patient ON prescriptions (patient)")
+    # Covers get_logged_in_users entirely, so the users table itself is never read
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_presence ON users (user_type, is_logged_in, username)")
+
+def add_keyset_index(conn):
+    # Chat history is paged by message id, so index (conversation_key, id) replaces the timestamp index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_key, id)")
+    conn.execute("DROP INDEX IF EXISTS idx_messages_conversation")
+
+def add_full_text_search(conn):
+    # Prescriptions had no date; new rows get one from give_prescription, old rows stay NULL
+    add_column(conn, "prescriptions", "created_at", "DATETIME")
+    # External-content FTS5 indexes over the existing tables, kept in sync by triggers
+    for table, column in (("messages", "message"), ("prescriptions", "prescription")):
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({column}, content='{table}', content_rowid='id')"
+        )
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts (rowid, {column}) VALUES (new.id, new.{column});
+        END;
+        """)
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END;
+        """)
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {table}_fts (rowid, {column}) VALUES (new.id, new.{column});
+        END;
+        """)
+        conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+def add_message_archives(conn):
+    # Catalog of the monthly archive partitions written by archive.py, with the id range each one holds
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS message_archives (
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        min_id INTEGER NOT NULL,
+        max_id INTEGER NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+def add_diagnosis_feedback(conn):
+    # One row per prediction; a doctor fills in the confirmed diagnosis, the online learner sets trained_version
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS diagnosis_feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient TEXT NOT NULL,
+        symptoms TEXT NOT NULL,
+        predicted TEXT,
+        diagnosis TEXT,
+        doctor TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        confirmed_at DATETIME,
+        trained_version INTEGER
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_patient ON diagnosis_feedback (patient, id)")
+    # Only confirmed, not yet learned cases are indexed, so the learner's poll stays cheap as the table grows
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_feedback_untrained ON diagnosis_feedback (id) "
+        "WHERE diagnosis IS NOT NULL AND trained_version IS NULL"
+    )
+
+def add_formulary(conn):
+    # Prescriptions per prognosis, editable without a code change; seeded from the built-in dictionary
+    from prescriptions import prescription_dict
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS formulary (
+        prognosis TEXT PRIMARY KEY,
+        prescription TEXT NOT NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    conn.executemany(
+        "INSERT OR IGNORE INTO formulary (prognosis, prescription) VALUES (?, ?)", prescription_dict.items()
+    )
+
+# Ordered list of (version, description, function); append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, "base tables", create_base_tables),
+    (2, "conversation key on messages", add_conversation_key),
+    (3, "prescription and presence indexes", add_lookup_indexes),
+    (4, "keyset index on messages", add_keyset_index),
+    (5, "full-text search over messages and prescriptions", add_full_text_search),
+    (6, "message archive catalog", add_message_archives),
+    (7, "diagnosis feedback for online learning", add_diagnosis_feedback),
+    (8, "formulary table", add_formulary),
+]
+
+# Function to get the highest migration version applied to the database
+def current_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+# Function to apply every pending migration, each in its own transaction
+def migrate(conn, migrations=MIGRATIONS):
+    applied = []
+    for version, description, apply in migrations:
+        if version <= current_version(conn):
+            continue
+        # BEGIN IMMEDIATE takes the write lock, so concurrent starters apply each migration once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version > current_version(conn):
+                apply(conn)
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+                applied.append(version)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return applied
+
+def main():
+    import db
+    db_file = sys.argv[1] if len(sys.argv) > 1 else "healthcare.db"
+    conn = db.connect(db_file)
+    applied = migrate(conn)
+    print(f"Applied migrations: {applied or 'none'}; schema version {current_version(conn)}")
+    problems = db.check_query_plans(conn)
+    for problem in problems:
+        print(problem)
+    conn.close()
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.model_selection import ParameterGrid
+import model_store
+from benchmark import latency_summary
+from symptoms import frame_to_sparse
+
+# Hyperparameter grid per classifier family in model_store.CLASSIFIERS
+# Only settings with predict_proba, since serving ranks prognoses by probability (so no hinge loss)
+PARAM_GRIDS = {
+    "logistic_regression": {"C": [0.1, 1.0, 10.0], "max_iter": [1000]},
+    "sgd": {"loss": ["log_loss", "modified_huber"], "alpha": [1e-4, 1e-3], "random_state": [0]},
+    "multinomial_nb": {"alpha": [0.1, 1.0]},
+    "bernoulli_nb": {"alpha": [0.1, 1.0]},
+    "decision_tree": {"max_depth": [None, 30], "random_state": [0]},
+    "random_forest": {"n_estimators": [50, 200], "random_state": [0], "n_jobs": [1]},
+    "knn": {"n_neighbors": [1, 5]},
+}
+
+# Single-row predictions timed per candidate
+LATENCY_QUERIES = 200
+
+# Data loaded once per worker process by the pool initializer
+_data = {}
+
+# Function to expand the grids into (family, params) candidates
+def candidates(grids=PARAM_GRIDS):
+    return [(family, params) for family, grid in grids.items() for params in ParameterGrid(grid)]
+
+# Function to load the training and test matrices as sparse rows with their labels
+def load_datasets(training_path, testing_path):
+    training_data = model_store.load_data(training_path)
+    testing_data = model_store.load_data(testing_path)
+    columns = [column for column in training_data.columns if column != 'prognosis']
+    return {
+        "X_train": frame_to_sparse(training_data, columns),
+        "y_train": training_data['prognosis'].astype(str).to_numpy(),
+        "X_test": frame_to_sparse(testing_data, columns),
+        "y_test": testing_data['prognosis'].astype(str).to_numpy(),
+    }
+
+def load_worker_data(training_path, testing_path):
+    _data.update(load_datasets(training_path, testing_path))
+
+# Function to fit and score one candidate inside a worker process; returns its result and the pickled pipeline
+def evaluate(candidate):
+    family, params = candidate
+    X_train, y_train, X_test, y_test = _data["X_train"], _data["y_train"], _data["X_test"], _data["y_test"]
+    pipeline = model_store.build_pipeline({"estimator": family, "params": params})
+
+    start = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    accuracy = float((pipeline.predict(X_test) == y_test).mean())
+    pickled = pickle.dumps(pipeline)
+    return {
+        "estimator": family,
+        "params": params,
+        "accuracy": accuracy,
+        "fit_seconds": fit_seconds,
+        "row_latency": None,
+        "batch_us_per_row": None,
+        "model_bytes": len(pickled),
+    }, pickled
+
+# Function to time one fitted pipeline; run candidates one after another in a single process,
+# since timing them next to busy workers would measure contention rather than the model
+def measure_latency(pipeline, X):
+    # Serving answers one patient at a time, so single-row latency is what the choice optimizes
+    rows = np.random.default_rng(0).integers(0, X.shape[0], LATENCY_QUERIES)
+    samples = []
+    for row in rows:
+        query = X[row]
+        start = time.perf_counter()
+        pipeline.predict_proba(query)
+        samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pipeline.predict_proba(X)
+    batch_seconds = time.perf_counter() - start
+    return latency_summary(samples), batch_seconds / X.shape[0] * 1e6
+
+# Function to fit every candidate on a process pool, one worker per core, then time the ones meeting the floor sequentially
+def run_selection(accuracy_floor, training_path=model_store.TRAINING_DATA, testing_path=model_store.TESTING_DATA, workers=None):
+    # Warm the parsed-dataset cache once so workers do not all parse the CSVs at the same time
+    data = load_datasets(training_path, testing_path)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=load_worker_data,
+                             initargs=(training_path, testing_path)) as pool:
+        fitted = list(pool.map(evaluate, candidates()))
+
+    results = []
+    for result, pickled in fitted:
+        if result["accuracy"] >= accuracy_floor:
+            result["row_latency"], result["batch_us_per_row"] = measure_latency(pickle.loads(pickled), data["X_train"])
+        results.append(result)
+    return results
+
+# Function to pick the fastest single-row model meeting the accuracy floor; ties go to the smaller model
+def choose(results, accuracy_floor):
+    eligible = [result for result in results if result["accuracy"] >= accuracy_floor and result["row_latency"] is not None]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda result: (result["row_latency"]["p50_ms"], result["model_bytes"]))
+
+# Function to format the leaderboard, fastest first; candidates below the floor are not timed and come last
+def format_leaderboard(results, accuracy_floor):
+    lines = [f"{'model':<60} {'acc':>6} {'fit s':>7} {'p50 ms':>7} {'p99 ms':>7} {'batch us':>8} {'KiB':>8}"]
+    timed = sorted((result for result in results if result["row_latency"] is not None), key=lambda result: result["row_latency"]["p50_ms"])
+    untimed = sorted((result for result in results if result["row_latency"] is None), key=lambda result: -result["accuracy"])
+    for result in timed + untimed:
+        name = f"{result['estimator']} {json.dumps(result['params'], sort_keys=True)}"
+        marker = " " if result["accuracy"] >= accuracy_floor else "x"
+        if result["row_latency"] is not None:
+            latency = f"{result['row_latency']['p50_ms']:>7.3f} {result['row_latency']['p99_ms']:>7.3f} {result['batch_us_per_row']:>8.2f}"
+        else:
+            latency = f"{'-':>7} {'-':>7} {'-':>8}"
+        lines.append(
+            f"{name[:60]:<60} {result['accuracy']:>6.3f} {result['fit_seconds']:>7.3f} "
+            f"{latency} {result['model_bytes'] / 1024:>8.1f} {marker}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit classifier families in parallel, time the accurate ones and pick the fastest for serving.")
+    parser.add_argument("--accuracy-floor", type=float, default=0.97, help="minimum test accuracy for serving")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: one per core)")
+    parser.add_argument("--output", default="model_leaderboard.json", help="where to write the full leaderboard")
+    parser.add_argument("--choice", default=model_store.MODEL_CHOICE, help="where to write the serving choice")
+    parser.add_argument("--dry-run", action="store_true", help="only report, keep the current serving choice")
+    args = parser.parse_args()
+
+    results = run_selection(args.accuracy_floor, workers=args.workers)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(format_leaderboard(results, args.accuracy_floor))
+
+    best = choose(results, args.accuracy_floor)
+    if best is None:
+        print(f"No model reached accuracy {args.accuracy_floor}; serving choice unchanged.")
+        return
+    print(f"Fastest model above the floor: {best['estimator']} {best['params']}")
+    if not args.dry_run:
+        with open(args.choice, "w") as f:
+            json.dump({key: best[key] for key in ("estimator", "params", "accuracy", "row_latency", "model_bytes")}, f, indent=2)
+        print(f"Saved serving choice to {args.choice}; the app retrains and serves it on its next rerun (unless ONLINE_LEARNING is set).")
+
+if __name__ == "__main__":
+    main()
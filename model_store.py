@@ -0,0 +1,174 @@
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import joblib
+import numpy as np
+import sklearn
+import dataset
+import compiled_model
+import metrics
+from symptoms import frame_to_sparse
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+
+# Location of the training data and the serialized model artifact
+TRAINING_DATA = "disease dataset/Training.csv"
+TESTING_DATA = "disease dataset/Testing.csv"
+ARTIFACT_DIR = "artifacts"
+MODEL_ARTIFACT = os.path.join(ARTIFACT_DIR, "model.joblib")
+# Classifier picked by model_selection.py for serving; LogisticRegression() when absent
+MODEL_CHOICE = "model_choice.json"
+
+# Classifier families model_selection.py can choose from, by the name stored in MODEL_CHOICE
+# Imported by name only when built, so serving does not load every family; all of them have predict_proba,
+# which the differential diagnosis, batch_predict.py and benchmark.py rely on
+CLASSIFIERS = {
+    "logistic_regression": "sklearn.linear_model.LogisticRegression",
+    "sgd": "sklearn.linear_model.SGDClassifier",
+    "multinomial_nb": "sklearn.naive_bayes.MultinomialNB",
+    "bernoulli_nb": "sklearn.naive_bayes.BernoulliNB",
+    "decision_tree": "sklearn.tree.DecisionTreeClassifier",
+    "random_forest": "sklearn.ensemble.RandomForestClassifier",
+    "knn": "sklearn.neighbors.KNeighborsClassifier",
+}
+
+# Cross-validation folds used to calibrate the probabilities shown in the differential diagnosis
+CALIBRATION_FOLDS = 5
+
+# Bump when the training code changes so stored artifacts are retrained
+PIPELINE_VERSION = 3
+
+# Function to load data and preprocess
+def load_data(file_path):
+    return dataset.load_symptom_data(file_path)
+
+# Function to read the serving choice: {"estimator": name in CLASSIFIERS, "params": {...}}, or None
+def load_model_choice(path=MODEL_CHOICE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        choice = json.load(f)
+    return {"estimator": choice["estimator"], "params": choice["params"]}
+
+# Function to create the classifier for a choice, defaulting to plain LogisticRegression
+def build_classifier(choice=None):
+    if choice is None:
+        return LogisticRegression()
+    module_name, _, class_name = CLASSIFIERS[choice["estimator"]].rpartition(".")
+    classifier = getattr(importlib.import_module(module_name), class_name)(**choice["params"])
+    if not hasattr(classifier, "predict_proba"):
+        raise ValueError(f"{choice['estimator']} {choice['params']} has no predict_proba and cannot rank prognoses")
+    return classifier
+
+# Function to create the pipeline for preprocessing and modeling, using the stored choice unless one is given
+# The classifier's scores are sigmoid-calibrated on out-of-fold predictions, so its probabilities can be shown as such;
+# ensemble=False then refits a single classifier on all rows, so serving costs no more than the uncalibrated model
+def build_pipeline(choice=None):
+    if choice is None:
+        choice = load_model_choice()
+    return Pipeline([
+        ('imputer', SimpleImputer(strategy='mean')),  # Impute missing values with mean
+        ('classifier', CalibratedClassifierCV(build_classifier(choice), method='sigmoid', cv=CALIBRATION_FOLDS, ensemble=False))
+    ])
+
+# Function to tell whether a served classifier gives calibrated probabilities (the online SGD model does not)
+def is_calibrated(classifier):
+    return isinstance(getattr(classifier, "named_steps", {}).get("classifier"), CalibratedClassifierCV)
+
+# Function to get the classifier a fitted pipeline calibrates
+def base_classifier(pipeline):
+    return pipeline.named_steps["classifier"].calibrated_classifiers_[0].estimator
+
+# Function to tell whether a fitted pipeline can be exported by compiled_model.py
+def is_linear(pipeline):
+    return hasattr(base_classifier(pipeline), "coef_")
+
+# Function to rank the k most likely prognoses of every row from a single predict_proba call
+# Returns one list of (prognosis, probability) per row, most likely first
+def rank_prognoses(classifier, X, k):
+    probabilities = classifier.predict_proba(X)
+    k = min(k, probabilities.shape[1])
+    top = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    top_probabilities = np.take_along_axis(probabilities, top, axis=1)
+    order = np.argsort(-top_probabilities, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_probabilities = np.take_along_axis(top_probabilities, order, axis=1)
+    labels = classifier.classes_[top]
+    return [
+        [(str(label), float(probability)) for label, probability in zip(row_labels, row_probabilities)]
+        for row_labels, row_probabilities in zip(labels, top_probabilities)
+    ]
+
+# Function to fingerprint the training data and the library that fits the model
+def compute_fingerprint(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {
+        "data_sha256": digest.hexdigest(),
+        "sklearn_version": sklearn.__version__,
+        "pipeline_version": PIPELINE_VERSION,
+        # A new serving choice retrains the artifact
+        "model_choice": load_model_choice(),
+    }
+
+# Function to train the pipeline and serialize it with its fingerprint
+@metrics.timed("model_seconds")
+def train_model(file_path, artifact_path=MODEL_ARTIFACT, fingerprint=None):
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(file_path)
+    training_data = load_data(file_path)
+    symptom_columns = [column for column in training_data.columns if column != 'prognosis']
+    # Train on a CSR matrix so cost scales with the symptoms present, not the vocabulary
+    X_train = frame_to_sparse(training_data, symptom_columns)
+    y_train = training_data['prognosis'].astype(str).to_numpy()
+
+    pipeline = build_pipeline()
+    pipeline.fit(X_train, y_train)
+
+    artifact = {
+        "fingerprint": fingerprint,
+        "columns": symptom_columns,
+        "pipeline": pipeline,
+    }
+    # Write to a temporary file first so readers never see a partial artifact
+    os.makedirs(os.path.dirname(artifact_path) or ".", exist_ok=True)
+    tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, artifact_path)
+
+    # Keep the dependency-free compiled predictor in step with the pipeline; it only handles linear models,
+    # so for any other choice the old export is removed rather than left serving a different model
+    compiled_dir = os.path.join(os.path.dirname(artifact_path), "compiled_model")
+    if is_linear(pipeline):
+        compiled_model.export_compiled(pipeline, symptom_columns, compiled_dir, fingerprint)
+    else:
+        shutil.rmtree(compiled_dir, ignore_errors=True)
+    return artifact
+
+# Function to load a stored artifact, returning None if it is missing or stale
+@metrics.timed("model_seconds")
+def load_artifact(artifact_path, fingerprint):
+    if not os.path.exists(artifact_path):
+        return None
+    try:
+        artifact = joblib.load(artifact_path)
+    except Exception:
+        return None
+    if artifact.get("fingerprint") != fingerprint:
+        return None
+    return artifact
+
+# Function to load the model, retraining only when the fingerprint changed
+@metrics.timed("model_seconds")
+def load_or_train(file_path, artifact_path=MODEL_ARTIFACT):
+    fingerprint = compute_fingerprint(file_path)
+    artifact = load_artifact(artifact_path, fingerprint)
+    if artifact is None:
+        artifact = train_model(file_path, artifact_path, fingerprint)
+    return artifact
@@ -0,0 +1,51 @@
+import threading
+
+# In-process publish/subscribe broker: one change counter per conversation
+class MessageBroker:
+    def __init__(self):
+        self._versions = {}
+        self._condition = threading.Condition()
+
+    # Function to announce that a conversation has new data
+    def publish(self, key):
+        with self._condition:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._condition.notify_all()
+
+    # Function to get the current change counter of a conversation
+    def version(self, key):
+        with self._condition:
+            return self._versions.get(key, 0)
+
+    # Function to block until a conversation moves past seen_version, returning the new version
+    def wait_for_change(self, key, seen_version, timeout=None):
+        with self._condition:
+            self._condition.wait_for(lambda: self._versions.get(key, 0) != seen_version, timeout)
+            return self._versions.get(key, 0)
+
+    def subscribe(self, key):
+        return Subscription(self, key)
+
+# One session's view of a conversation: remembers the last version it rendered
+class Subscription:
+    def __init__(self, broker, key):
+        self.broker = broker
+        self.key = key
+        self.seen_version = broker.version(key)
+
+    # Function to check for news without blocking; marks it seen when there is some
+    def poll(self):
+        version = self.broker.version(self.key)
+        changed = version != self.seen_version
+        self.seen_version = version
+        return changed
+
+    # Function to block until there is news or the timeout passes
+    def wait(self, timeout=None):
+        version = self.broker.wait_for_change(self.key, self.seen_version, timeout)
+        changed = version != self.seen_version
+        self.seen_version = version
+        return changed
+
+# Broker shared by every session in this process
+broker = MessageBroker()
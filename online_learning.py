@@ -0,0 +1,201 @@
+import copy
+import json
+import os
+import threading
+import traceback
+from collections import namedtuple
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+import db
+import model_store
+from symptoms import build_symptom_index, frame_to_sparse, to_sparse_matrix
+
+# Served online model, persisted separately from the batch artifact
+ONLINE_MODEL = os.path.join(model_store.ARTIFACT_DIR, "online_model.joblib")
+# Confirmed cases applied per partial_fit mini-batch
+FEEDBACK_BATCH_SIZE = 32
+# How often the background learner looks for newly confirmed cases
+LEARN_INTERVAL_SECONDS = 30
+# Passes over the training data when the base online model is built
+BASE_EPOCHS = 5
+
+# Case recorded when a prediction is made; the symptoms are a JSON list of symptom column names
+RECORD_CASE_SQL = "INSERT INTO diagnosis_feedback (patient, symptoms, predicted) VALUES (?, ?, ?)"
+# A doctor confirms (or corrects) the diagnosis of a recorded case
+CONFIRM_CASE_SQL = """
+UPDATE diagnosis_feedback SET diagnosis=?, doctor=?, confirmed_at=CURRENT_TIMESTAMP
+WHERE id=?
+"""
+# Cases of a patient still waiting for a doctor, newest first
+PENDING_CASES_SQL = """
+SELECT id, symptoms, predicted, created_at FROM diagnosis_feedback
+WHERE patient=? AND diagnosis IS NULL
+ORDER BY id DESC
+"""
+# Confirmed cases the served model has not learned from yet
+UNTRAINED_CASES_SQL = """
+SELECT id, symptoms, diagnosis FROM diagnosis_feedback
+WHERE diagnosis IS NOT NULL AND trained_version IS NULL
+ORDER BY id
+LIMIT ?
+"""
+
+# One immutable version of the served model; replaced as a whole, never changed in place
+ModelSnapshot = namedtuple("ModelSnapshot", ["version", "classifier", "columns", "data_sha256"])
+
+# Function to create the incrementally trainable classifier (logistic loss, so predict_proba works)
+def build_online_classifier():
+    return SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+
+# Function to train the starting online model on the training data in shuffled mini-batches
+def train_base(file_path, epochs=BASE_EPOCHS, batch_size=256):
+    training_data = model_store.load_data(file_path)
+    columns = [column for column in training_data.columns if column != 'prognosis']
+    X = frame_to_sparse(training_data, columns)
+    y = training_data['prognosis'].astype(str).to_numpy()
+    classes = np.unique(y)
+    classifier = build_online_classifier()
+    rng = np.random.default_rng(0)
+    for _ in range(epochs):
+        order = rng.permutation(len(y))
+        for start in range(0, len(y), batch_size):
+            batch = order[start:start + batch_size]
+            classifier.partial_fit(X[batch], y[batch], classes=classes)
+    return classifier, columns
+
+# Function to write a snapshot to disk without readers ever seeing a partial file
+def save_snapshot(snapshot, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(snapshot._asdict(), tmp_path)
+    os.replace(tmp_path, path)
+
+# Holder of the current model version; predictions read it, the learner swaps it
+class ServedModel:
+    def __init__(self, snapshot, path=ONLINE_MODEL):
+        self.path = path
+        self._snapshot = snapshot
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    # Snapshot to predict with; a single attribute read, so a swap is never seen half-done
+    @property
+    def current(self):
+        return self._snapshot
+
+    # Function to register a callback run after every swap, e.g. to clear prediction caches
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Function to publish a new classifier as the next version
+    def swap(self, classifier):
+        with self._lock:
+            old = self._snapshot
+            snapshot = old._replace(version=old.version + 1, classifier=classifier)
+            save_snapshot(snapshot, self.path)
+            self._snapshot = snapshot
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+
+# Function to load the served online model, rebuilding it when the training data changed
+# Returns the model and whether it was rebuilt (in which case every case must be learned again)
+def load_or_build(file_path=model_store.TRAINING_DATA, path=ONLINE_MODEL):
+    data_sha256 = model_store.compute_fingerprint(file_path)["data_sha256"]
+    if os.path.exists(path):
+        try:
+            stored = joblib.load(path)
+            if stored.get("data_sha256") == data_sha256:
+                return ServedModel(ModelSnapshot(**stored), path), False
+        except Exception:
+            pass
+    classifier, columns = train_base(file_path)
+    snapshot = ModelSnapshot(version=1, classifier=classifier, columns=columns, data_sha256=data_sha256)
+    save_snapshot(snapshot, path)
+    return ServedModel(snapshot, path), True
+
+# Function to learn one mini-batch of confirmed cases on a copy of the classifier
+# Returns (new classifier or None, ids of the cases consumed)
+def learn_batch(snapshot, rows):
+    symptom_index = build_symptom_index(snapshot.columns)
+    known = set(snapshot.classifier.classes_)
+    symptom_sets, labels = [], []
+    for _, symptoms, diagnosis in rows:
+        try:
+            names = [name for name in json.loads(symptoms) if name in symptom_index]
+        except (TypeError, ValueError):
+            # Consumed like a case without symptoms, so one malformed row cannot stall every later case
+            names = []
+        # partial_fit cannot add classes, so cases with an unknown diagnosis or no symptoms are skipped
+        if names and diagnosis in known:
+            symptom_sets.append(names)
+            labels.append(diagnosis)
+    ids = [row[0] for row in rows]
+    if not labels:
+        return None, ids
+    # The served classifier is never touched; readers keep using it until the swap
+    classifier = copy.deepcopy(snapshot.classifier)
+    classifier.partial_fit(to_sparse_matrix(symptom_sets, symptom_index), np.array(labels))
+    return classifier, ids
+
+# Background thread that applies newly confirmed cases and hot-swaps the served model
+class OnlineLearner:
+    def __init__(self, db_file, served, relearn=False, interval_seconds=LEARN_INTERVAL_SECONDS, batch_size=FEEDBACK_BATCH_SIZE):
+        self.db_file = db_file
+        self.served = served
+        self.relearn = relearn
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+        self._thread.start()
+
+    # Function to learn from every pending confirmed case, returning how many versions were published
+    def run_once(self):
+        conn = db.connect(self.db_file)
+        swaps = 0
+        try:
+            while True:
+                rows = conn.execute(UNTRAINED_CASES_SQL, (self.batch_size,)).fetchall()
+                if not rows:
+                    break
+                classifier, ids = learn_batch(self.served.current, rows)
+                if classifier is not None:
+                    self.served.swap(classifier)
+                    swaps += 1
+                # Marked after the swap is saved: a crash in between re-learns the batch rather than losing it
+                with conn:
+                    conn.executemany(
+                        "UPDATE diagnosis_feedback SET trained_version=? WHERE id=?",
+                        [(self.served.current.version, case_id) for case_id in ids],
+                    )
+        finally:
+            conn.close()
+        return swaps
+
+    # Function to make a rebuilt model learn every confirmed case again
+    def reset(self):
+        conn = db.connect(self.db_file)
+        try:
+            with conn:
+                conn.execute("UPDATE diagnosis_feedback SET trained_version=NULL WHERE trained_version IS NOT NULL")
+        finally:
+            conn.close()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.relearn:
+                    self.reset()
+                    self.relearn = False
+                self.run_once()
+            except Exception as e:
+                # Anything else (e.g. an OSError saving the model) would otherwise end the thread without a trace
+                print(f"Online learning failed: {e!r}")
+                traceback.print_exc()
+            self._stop.wait(self.interval_seconds)
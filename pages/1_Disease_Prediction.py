@@ -0,0 +1,18 @@
+import streamlit as st
+import metrics
+import prediction
+from resources import DATABASE, METRICS_PORT, get_metrics_server, send_heartbeat
+
+# Disease prediction page; it runs in the same server as the chat page and reuses its login
+get_metrics_server(METRICS_PORT)
+session = st.session_state.get("session")
+if session is None or not session.logged_in:
+    st.warning("Please login to use disease prediction.")
+    st.page_link("main.py", label="Go to login")
+    st.stop()
+
+# Keeps the user in the online lists while they stay on this page
+send_heartbeat(DATABASE, session.username, session.user_type)
+
+with metrics.rerun_timer("prediction"):
+    prediction.main(session.username, session.user_type)
@@ -1,79 +1,210 @@
+import json
+import queue
+import sqlite3
 import streamlit as st
-import pandas as pd
-from sklearn.pipeline import Pipeline
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression
-import speech_recognition as sr
+from streamlit_webrtc import webrtc_streamer, WebRtcMode
 import warnings
+import metrics
+import model_store
+from symptom_cache import PredictionCache, pack_indices, warm_cache
+from symptoms import build_symptom_index, group_symptoms, symptom_indices, to_sparse
+from symptom_matcher import SymptomMatcher, symptom_phrase
+import speech
+from inference_server import DIFFERENTIAL_SIZE
+from prescriptions import NO_PRESCRIPTION
+from online_learning import RECORD_CASE_SQL
+from resources import DATABASE, INFERENCE_SERVER, get_formulary, get_inference_client, get_served_model, get_write_queue
 
-# Function to load data and preprocess
-def load_data(file_path):
-    data = pd.read_csv(file_path)
-    if 'Unnamed: 133' in data.columns:
-        data = data.drop('Unnamed: 133', axis=1)
-    return data
-
-# Load the datasets
-training_data = load_data("disease dataset/Training.csv")
-testing_data = load_data("disease dataset/Testing.csv")
-
-# Preprocess data
-X_train = training_data.drop('prognosis', axis=1)
-y_train = training_data['prognosis']
-
-# Create a pipeline for preprocessing and modeling
-pipeline = Pipeline([
-    ('imputer', SimpleImputer(strategy='mean')),  # Impute missing values with mean
-#    ('classifier', LogisticRegression(multi_class='multinomial', max_iter=1000))
-    ('classifier', LogisticRegression())
-])
-
-# Train the model using the pipeline
-pipeline.fit(X_train, y_train)
-
-# Prescription dictionary mapping diseases to drugs
-prescription_dict = {
-    'Fungal infection': 'Drug_A',
-    'Allergy': 'Drug_B',
-    'GERD': 'Drug_C',
-    'Chronic cholestasis': 'Drug_D',
-    'Drug Reaction': 'Drug_E',
-    'Acne': 'Dolo 650',
-    # Add more mappings as per your dataset
-}
-
-# Function to predict disease and generate prescription
-def predict_disease(symptoms):
-    # Predict disease
-    disease_prediction = pipeline.predict([symptoms])[0]
-    
-    # Get prescription for predicted disease
-    prescription = prescription_dict.get(disease_prediction, "No prescription found")
-    
-    return disease_prediction, prescription
+# Function to build the voice/free-text symptom matcher once per symptom vocabulary
+@st.cache_resource
+def get_symptom_matcher(columns):
+    return SymptomMatcher(columns)
 
-# Function to handle voice input using SpeechRecognition
-def get_voice_input():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        st.info("Listening... Speak your symptoms.")
-        audio = recognizer.listen(source)
-    
+# Answers queries for one symptom vocabulary: its prediction cache and prescriptions
+# Subclasses rank prognoses, with a served model in this process or on the inference server
+class Predictor:
+    def __init__(self, columns, formulary, calibrated):
+        self.formulary = formulary
+        self.columns = columns
+        self.symptom_index = build_symptom_index(self.columns)
+        self.symptom_groups = group_symptoms(self.columns)
+        self.calibrated = calibrated
+        self.cache = PredictionCache(maxsize=4096)
+        # Published on /metrics; the predictor of a newer model takes over the series from the one it replaces
+        for name, kind, stat in (
+            ("prediction_cache_hits_total", "counter", "hits"),
+            ("prediction_cache_misses_total", "counter", "misses"),
+            ("prediction_cache_entries", "gauge", "size"),
+        ):
+            metrics.registry.collect(name, kind, lambda stat=stat: self.cache.stats()[stat])
+
+    # Function to rank the DIFFERENTIAL_SIZE most likely (prognosis, probability) pairs of one symptom set
+    # Returns the ranking and whether it may be cached
+    def rank(self, indices):
+        raise NotImplementedError
+
+    # Function to rank the most likely prognoses with their probabilities and prescriptions
+    # symptoms may be a set of symptom names or column indices, or a dense 0/1 vector
+    @metrics.timed("model_seconds")
+    def differential_diagnosis(self, symptoms, k=DIFFERENTIAL_SIZE):
+        # Rankings are cached per symptom set, so a repeated pattern costs no model call at all
+        indices = symptom_indices(symptoms, self.symptom_index)
+        mask = pack_indices(indices)
+        ranked = self.cache.get(mask)
+        if ranked is None:
+            ranked, cacheable = self.rank(indices)
+            if cacheable:
+                self.cache.put(mask, ranked)
+        return [(prognosis, probability, self.formulary.get(prognosis, NO_PRESCRIPTION)) for prognosis, probability in ranked[:k]]
+
+    # Function to predict the most likely disease and its prescription
+    def predict_disease(self, symptoms):
+        disease_prediction, _, prescription = self.differential_diagnosis(symptoms, k=1)[0]
+        return disease_prediction, prescription
+
+    # Function to turn a symptom selection into sorted symptom column names
+    def symptom_names(self, symptoms):
+        return sorted(self.columns[index] for index in symptom_indices(symptoms, self.symptom_index))
+
+# Ranks with a model served in this process
+class ModelPredictor(Predictor):
+    def __init__(self, served_model, formulary):
+        snapshot = served_model.current
+        # Only the artifact's probabilities are calibrated; the online model's are just scores for ranking
+        super().__init__(snapshot.columns, formulary, model_store.is_calibrated(snapshot.classifier))
+        self.served_model = served_model
+
+        # Pre-warmed with every known symptom pattern
+        frames = [model_store.load_data(model_store.TRAINING_DATA), model_store.load_data(model_store.TESTING_DATA)]
+        warm_cache(self.cache, lambda X: model_store.rank_prognoses(snapshot.classifier, X, DIFFERENTIAL_SIZE), self.columns, frames)
+        # Cached predictions belong to one model version, so a hot swap empties the cache
+        served_model.add_listener(lambda snapshot: self.cache.clear())
+
+    def rank(self, indices):
+        snapshot = self.served_model.current
+        ranked = model_store.rank_prognoses(snapshot.classifier, to_sparse(indices, self.symptom_index), DIFFERENTIAL_SIZE)[0]
+        # Skip caching if a newer model version was swapped in meanwhile
+        return ranked, self.served_model.current.version == snapshot.version
+
+# Ranks on the shared inference server, so this process never loads a model; the server's compiled model is calibrated
+class ServerPredictor(Predictor):
+    def __init__(self, client, formulary):
+        super().__init__(client.symptoms(), formulary, calibrated=True)
+        self.client = client
+
+    def rank(self, indices):
+        differential = self.client.predict(indices)["differential"]
+        return [(entry["prognosis"], entry["probability"]) for entry in differential], True
+
+# Function to build the predictor once per served model, keyed as returned by get_served_model
+@st.cache_resource
+def get_predictor(model_key, _served_model):
+    # Prognosis -> prescription index, loaded from the formulary table
+    return ModelPredictor(_served_model, get_formulary(DATABASE))
+
+# Function to build the predictor for the inference server once per process
+@st.cache_resource
+def get_server_predictor(address):
+    return ServerPredictor(get_inference_client(address), get_formulary(DATABASE))
+
+# Function to show the ranked differential diagnosis below the prediction
+def display_differential(predictor, symptoms):
+    ranked = predictor.differential_diagnosis(symptoms)
+    if len(ranked) < 2:
+        return
+    st.subheader("Differential Diagnosis")
+    if not predictor.calibrated:
+        st.caption("Most likely first. The online model's scores are not calibrated, so no probabilities are shown.")
+        st.table([{"Prognosis": prognosis, "Prescription": prescription} for prognosis, _, prescription in ranked])
+        return
+    st.table([
+        {"Prognosis": prognosis, "Probability": f"{probability:.1%}", "Prescription": prescription}
+        for prognosis, probability, prescription in ranked
+    ])
+
+# Function to record a prediction as a case a doctor can later confirm, feeding online learning
+def record_case(predictor, patient, symptoms, disease_prediction):
     try:
-        text = recognizer.recognize_google(audio)
-        st.success(f"Recognized text: {text}")
-        return text
-    except sr.UnknownValueError:
-        st.warning("Sorry, I could not understand your voice.")
-        return None
-    except sr.RequestError:
-        st.error("Speech recognition service is currently unavailable.")
+        get_write_queue(DATABASE).write(RECORD_CASE_SQL, (patient, json.dumps(predictor.symptom_names(symptoms)), disease_prediction))
+    except sqlite3.Error as e:
+        st.error(f"Error recording case: {e}")
+
+# Function to load the offline speech model once per process
+@st.cache_resource
+def get_vosk_model(model_path):
+    return speech.load_vosk_model(model_path)
+
+# Function to create a recognizer backend for one recording, or None when the offline model cannot be loaded
+# Audio only goes to the cloud when SPEECH_BACKEND=google is set explicitly
+def create_speech_backend():
+    if speech.SPEECH_BACKEND == "vosk":
+        try:
+            return speech.create_backend("vosk", get_vosk_model(speech.VOSK_MODEL_PATH))
+        except Exception as e:
+            st.error(
+                f"Offline speech model not available at {speech.VOSK_MODEL_PATH} ({e}). "
+                "Download one as described in speech.py, or set SPEECH_BACKEND=google to use Google speech recognition."
+            )
+            return None
+    return speech.create_backend(speech.SPEECH_BACKEND)
+
+# Function to handle voice input streamed from the browser over WebRTC
+def get_voice_input():
+    webrtc_ctx = webrtc_streamer(
+        key="speech-to-text",
+        mode=WebRtcMode.SENDONLY,
+        audio_receiver_size=1024,
+        media_stream_constraints={"video": False, "audio": True},
+    )
+
+    # While recording, decode on the transcriber's worker thread and show partial results
+    if webrtc_ctx.state.playing:
+        if "transcriber" not in st.session_state:
+            backend = create_speech_backend()
+            if backend is None:
+                return None
+            st.session_state.transcriber = speech.StreamingTranscriber(backend)
+            st.session_state.resampler = speech.create_resampler()
+        transcriber = st.session_state.transcriber
+        st.info("Listening... Speak your symptoms, then press Stop.")
+        transcript = st.empty()
+        while webrtc_ctx.state.playing and webrtc_ctx.audio_receiver:
+            try:
+                frames = webrtc_ctx.audio_receiver.get_frames(timeout=1)
+            except queue.Empty:
+                continue
+            transcriber.feed(speech.frames_to_pcm(frames, st.session_state.resampler))
+            transcript.write(transcriber.text())
         return None
 
-# Main function to run Streamlit app
-def main():
+    # Recording stopped: collect the final transcript
+    if "transcriber" in st.session_state:
+        transcriber = st.session_state.pop("transcriber")
+        st.session_state.pop("resampler", None)
+        try:
+            text = transcriber.stop()
+        except Exception:
+            st.error("Speech recognition service is currently unavailable.")
+            return None
+        if text:
+            st.success(f"Recognized text: {text}")
+            return text
+        st.warning("Sorry, I could not understand your voice.")
+    return None
+
+# Main function to render the prediction page for the logged-in user
+def main(username, user_type):
+    if INFERENCE_SERVER:
+        predictor = get_server_predictor(INFERENCE_SERVER)
+    else:
+        # Resolved on every rerun, so a retrained model is picked up without restarting the server
+        served_model, model_key = get_served_model(DATABASE)
+        predictor = get_predictor(model_key, served_model)
+    symptom_matcher = get_symptom_matcher(tuple(predictor.columns))
+
     st.title("Disease Prognosis Prediction and Prescription Generator")
-    st.markdown("[Go Back](http://localhost:8000)")
+    st.page_link("main.py", label="Go Back")
+    st.caption(f"Logged in as {username}")
     #st.markdown(title, unsafe_allow_html=True)
     # Adding CSS styling
     # Set the background image
@@ -147,22 +278,27 @@ def main():
     # Manual selection of symptoms
     if input_method == "Manual selection":
         st.subheader("Select Symptoms")
-        selected_symptoms = []
-        for symptom in X_train.columns:
-            selected = st.checkbox(symptom)
-            if selected:
-                selected_symptoms.append(1)  # Assuming 1 represents presence of symptom
-            else:
-                selected_symptoms.append(0)  # 0 represents absence of symptom
+        # Selections stay in the browser until Predict is pressed, so picking symptoms causes no reruns
+        with st.form("symptom_form"):
+            selected_symptoms = set()  # Only the symptoms that are present are kept
+            for group, symptoms in predictor.symptom_groups.items():
+                selected_symptoms.update(st.multiselect(
+                    group, symptoms, format_func=symptom_phrase, placeholder="Type to search symptoms",
+                ))
+            submitted = st.form_submit_button("Predict")
 
         # Predict disease based on selected symptoms
-        if st.button("Predict"):
-            if any(selected_symptoms):
-                disease_prediction, prescription = predict_disease(selected_symptoms)
+        if submitted:
+            if selected_symptoms:
+                disease_prediction, prescription = predictor.predict_disease(selected_symptoms)
+                # Only a patient's own predictions become cases for a doctor to confirm, not staff trying the model
+                if user_type == "Patient":
+                    record_case(predictor, username, selected_symptoms, disease_prediction)
                 st.subheader("Prediction")
                 st.write(f"The predicted disease is: {disease_prediction}")
                 st.subheader("Prescription")
                 st.write(f"Prescribed drug: {prescription}")
+                display_differential(predictor, selected_symptoms)
             else:
                 st.warning("Please select at least one symptom to predict the disease.")
     
@@ -172,15 +308,14 @@ def main():
         symptoms_text = get_voice_input()
         if symptoms_text:
             # Process text to determine selected symptoms
-            selected_symptoms = [1 if symptom.lower() in symptoms_text.lower() else 0 for symptom in X_train.columns]
+            selected_symptoms = symptom_matcher.match(symptoms_text)
             
             # Predict disease based on selected symptoms
-            disease_prediction, prescription = predict_disease(selected_symptoms)
+            disease_prediction, prescription = predictor.predict_disease(selected_symptoms)
+            if selected_symptoms and user_type == "Patient":
+                record_case(predictor, username, selected_symptoms, disease_prediction)
             st.subheader("Prediction")
             st.write(f"The predicted disease is: {disease_prediction}")
             st.subheader("Prescription")
             st.write(f"Prescribed drug: {prescription}")
-
-# Run the main function to start the Streamlit app
-if __name__ == "__main__":
-    main()
+            display_differential(predictor, selected_symptoms)
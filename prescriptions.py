@@ -0,0 +1,33 @@
+import db
+
+# Default database holding the formulary for the command-line tools
+DATABASE = "healthcare.db"
+
+# Prescription dictionary mapping diseases to drugs; only seeds the formulary table (see migrations.py)
+prescription_dict = {
+    'Fungal infection': 'Drug_A',
+    'Allergy': 'Drug_B',
+    'GERD': 'Drug_C',
+    'Chronic cholestasis': 'Drug_D',
+    'Drug Reaction': 'Drug_E',
+    'Acne': 'Dolo 650',
+    # Add more mappings as per your dataset
+}
+
+# Shown when the formulary has no entry for a prognosis
+NO_PRESCRIPTION = "No prescription found"
+
+FORMULARY_SQL = "SELECT prognosis, prescription FROM formulary"
+
+# Function to load the formulary table into a prognosis -> prescription dictionary
+def load_formulary(conn):
+    return dict(conn.execute(FORMULARY_SQL).fetchall())
+
+# Function to load the formulary for a command-line tool, migrating the database first like the app does
+def read_formulary(db_file=DATABASE):
+    conn = db.connect(db_file)
+    try:
+        db.create_schema(conn)
+        return load_formulary(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+# In-memory record of who is online, kept fresh by session heartbeats and expired after a TTL
+class PresenceRegistry:
+    def __init__(self, ttl_seconds=60, on_change=None, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._on_change = on_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        # username -> (user_type, last heartbeat), least recently seen first
+        self._last_seen = OrderedDict()
+        self._online = {}
+        self._snapshots = {}
+
+    # Function to record that a session is alive; returns True if the user just came online
+    def heartbeat(self, username, user_type):
+        with self._lock:
+            expired = self._expire_locked()
+            came_online = username not in self._last_seen
+            self._last_seen[username] = (user_type, self._clock())
+            self._last_seen.move_to_end(username)
+            if came_online:
+                self._online.setdefault(user_type, set()).add(username)
+                self._snapshots.pop(user_type, None)
+        self._notify(expired, [username] if came_online else [])
+        return came_online
+
+    # Function to take a user offline straight away (explicit logout)
+    def remove(self, username):
+        with self._lock:
+            was_online = self._remove_locked(username)
+        self._notify([username] if was_online else [], [])
+        return was_online
+
+    # Function to list the online users of one role
+    def online(self, user_type):
+        with self._lock:
+            expired = self._expire_locked()
+            snapshot = self._snapshots.get(user_type)
+            if snapshot is None:
+                snapshot = sorted(self._online.get(user_type, ()))
+                self._snapshots[user_type] = snapshot
+        self._notify(expired, [])
+        return list(snapshot)
+
+    # Function to drop users whose last heartbeat is older than the TTL
+    def expire(self):
+        with self._lock:
+            expired = self._expire_locked()
+        self._notify(expired, [])
+        return expired
+
+    def _expire_locked(self):
+        expired = []
+        deadline = self._clock() - self.ttl_seconds
+        # Entries are ordered by last heartbeat, so only the stale prefix is visited
+        while self._last_seen:
+            username, (_, last_seen) = next(iter(self._last_seen.items()))
+            if last_seen > deadline:
+                break
+            self._remove_locked(username)
+            expired.append(username)
+        return expired
+
+    def _remove_locked(self, username):
+        entry = self._last_seen.pop(username, None)
+        if entry is None:
+            return False
+        self._online.get(entry[0], set()).discard(username)
+        self._snapshots.pop(entry[0], None)
+        return True
+
+    # State changes are reported outside the lock so persistence never blocks lookups
+    def _notify(self, went_offline, came_online):
+        if self._on_change is None:
+            return
+        for username in came_online:
+            self._on_change(username, 1)
+        for username in went_offline:
+            self._on_change(username, 0)
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+from functools import partial
+import streamlit as st
+import db
+import metrics
+import model_store
+import online_learning
+from inference_server import InferenceClient
+from prescriptions import load_formulary
+from presence import PresenceRegistry
+from write_queue import WriteQueue
+
+# Process-wide resources shared by every page of the app, so each exists once per server
+
+# Database file shared by every session
+DATABASE = "healthcare.db"
+
+# Set ONLINE_LEARNING=1 to serve the online model, which keeps learning from doctor-confirmed cases (see online_learning.py)
+# By default the app serves the model artifact, the same model batch_predict.py, benchmark.py and inference_server.py use
+ONLINE_LEARNING = os.environ.get("ONLINE_LEARNING") == "1"
+
+# Optional shared inference server, e.g. "127.0.0.1:8765" (see inference_server.py); when set, predictions come from it
+# and the app never loads a model of its own. It scores with the compiled model artifact, so leave it unset with ONLINE_LEARNING
+INFERENCE_SERVER = os.environ.get("INFERENCE_SERVER")
+
+# Sessions heartbeat every PRESENCE_HEARTBEAT_SECONDS and count as offline after PRESENCE_TTL_SECONDS of silence
+PRESENCE_HEARTBEAT_SECONDS = 20
+PRESENCE_TTL_SECONDS = 90
+
+# Port of the /metrics (Prometheus text) and /slow (slow rerun profiles) endpoint
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9101"))
+
+# Function to start the metrics endpoint once per process
+@st.cache_resource
+def get_metrics_server(port):
+    return metrics.start_server(port)
+
+# Function to open the database connection pool once per process, shared by every session
+@st.cache_resource
+def get_database(db_file):
+    return db.ConnectionPool(db_file)
+
+# Function to start the shared write queue once per process
+@st.cache_resource
+def get_write_queue(db_file):
+    # The pool runs migrations, so create it before the writer connects
+    get_database(db_file)
+    return WriteQueue(db_file)
+
+# Function to load the served online model once per process and start the learner that keeps it current
+@st.cache_resource
+def get_online_model(db_file):
+    get_database(db_file)
+    served, rebuilt = online_learning.load_or_build()
+    online_learning.OnlineLearner(db_file, served, relearn=rebuilt)
+    return served
+
+# Function to load the model artifact once per version of the training data and serving choice, wrapped like the online model
+@st.cache_resource
+def get_model_artifact(file_path, data_stamp, choice_stamp):
+    # The stamps only key the cache so an edited dataset or a new model_selection.py choice is picked up
+    artifact = model_store.load_or_train(file_path)
+    snapshot = online_learning.ModelSnapshot(
+        version=1, classifier=artifact["pipeline"], columns=artifact["columns"],
+        data_sha256=artifact["fingerprint"]["data_sha256"],
+    )
+    # Never swapped, so it has no file of its own
+    return online_learning.ServedModel(snapshot, path=None)
+
+# Function to stamp a file by modification time and size, so cached resources notice when it is edited
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Function to resolve the served model and a key identifying it
+# Called on every rerun, so an edited dataset or serving choice is picked up without restarting the server
+def get_served_model(db_file):
+    if ONLINE_LEARNING:
+        return get_online_model(db_file), ("online", db_file)
+    key = ("artifact", file_stamp(model_store.TRAINING_DATA), file_stamp(model_store.MODEL_CHOICE))
+    return get_model_artifact(model_store.TRAINING_DATA, *key[1:]), key
+
+# Function to create the inference server client once per process
+@st.cache_resource
+def get_inference_client(address):
+    return InferenceClient(address)
+
+# Function to fetch the prognoses the inference server can predict once per process
+@st.cache_resource
+def get_server_prognoses(address):
+    return get_inference_client(address).prognoses()
+
+# Function to list the prognoses of whichever model answers predictions
+def get_prognoses(db_file):
+    if INFERENCE_SERVER:
+        return get_server_prognoses(INFERENCE_SERVER)
+    return [str(label) for label in get_served_model(db_file)[0].current.classifier.classes_]
+
+# Function to load the formulary into memory once per process; restart (or clear this cache) after editing it
+@st.cache_resource
+def get_formulary(db_file):
+    with get_database(db_file).connection() as conn:
+        return load_formulary(conn)
+
+# Function to write a presence change to the users table of db_file
+# It runs inside helpers that already hold a pool connection, so it writes through the write queue (which has its own)
+def persist_login_status(db_file, username, status):
+    try:
+        get_write_queue(db_file).write("UPDATE users SET is_logged_in=? WHERE username=?", (status, username))
+    except sqlite3.Error as e:
+        st.error(f"Error updating login status: {e}")
+
+# Function to create the in-memory presence registry once per process and database
+@st.cache_resource
+def get_presence(db_file):
+    # Nobody is online until their session heartbeats, so clear flags left by a previous process
+    get_write_queue(db_file).write("UPDATE users SET is_logged_in=0 WHERE is_logged_in=1")
+    return PresenceRegistry(ttl_seconds=PRESENCE_TTL_SECONDS, on_change=partial(persist_login_status, db_file))
+
+# Function to keep a logged-in session marked as online while any page of the app is open
+@st.fragment(run_every=PRESENCE_HEARTBEAT_SECONDS)
+def send_heartbeat(db_file, username, user_type):
+    get_presence(db_file).heartbeat(username, user_type)
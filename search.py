@@ -0,0 +1,64 @@
+import re
+
+# Function to turn free text into a safe FTS5 query: every word must match, the last one as a prefix
+def build_match_query(text):
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+# Function to search messages, best matches first, optionally limited to a participant and a date range
+def search_messages(conn, text, participant=None, chat_with=None, since=None, until=None, limit=20):
+    match = build_match_query(text)
+    if match is None:
+        return []
+    sql = """
+    SELECT m.id, m.sender, m.receiver, snippet(messages_fts, 0, '**', '**', '...', 12), m.timestamp
+    FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+    WHERE messages_fts MATCH ?
+    """
+    params = [match]
+    if participant is not None:
+        sql += " AND (m.sender=? OR m.receiver=?)"
+        params += [participant, participant]
+    if chat_with is not None:
+        sql += " AND (m.sender=? OR m.receiver=?)"
+        params += [chat_with, chat_with]
+    if since is not None:
+        sql += " AND m.timestamp>=?"
+        params.append(since)
+    if until is not None:
+        sql += " AND m.timestamp<?"
+        params.append(until)
+    sql += " ORDER BY bm25(messages_fts) LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+# Function to search prescriptions, best matches first, optionally limited to a doctor, patient and date range
+def search_prescriptions(conn, text, doctor=None, patient=None, since=None, until=None, limit=20):
+    match = build_match_query(text)
+    if match is None:
+        return []
+    sql = """
+    SELECT p.id, p.doctor, p.patient, snippet(prescriptions_fts, 0, '**', '**', '...', 12), p.status, p.created_at
+    FROM prescriptions_fts JOIN prescriptions p ON p.id = prescriptions_fts.rowid
+    WHERE prescriptions_fts MATCH ?
+    """
+    params = [match]
+    if doctor is not None:
+        sql += " AND p.doctor=?"
+        params.append(doctor)
+    if patient is not None:
+        sql += " AND p.patient=?"
+        params.append(patient)
+    if since is not None:
+        sql += " AND p.created_at>=?"
+        params.append(since)
+    if until is not None:
+        sql += " AND p.created_at<?"
+        params.append(until)
+    sql += " ORDER BY bm25(prescriptions_fts) LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
@@ -0,0 +1,150 @@
+import json
+import os
+import queue
+import threading
+import wave
+import metrics
+
+# Audio format every backend receives: 16 kHz, mono, signed 16-bit PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Which recognizer to use and where the offline model lives; "google" sends the audio to Google's cloud service
+# The model is not shipped: download one from https://alphacephei.com/vosk/models (e.g. vosk-model-small-en-us-0.15)
+# and unpack it so VOSK_MODEL_PATH is the directory holding its am/ and conf/ folders
+SPEECH_BACKEND = os.environ.get("SPEECH_BACKEND", "vosk")
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", os.path.join("artifacts", "vosk-model"))
+
+# Offline recognizer that decodes audio incrementally with a local Vosk model
+class VoskBackend:
+    def __init__(self, model):
+        self._model = model
+        self._recognizer = None
+
+    def start(self):
+        import vosk
+        self._recognizer = vosk.KaldiRecognizer(self._model, SAMPLE_RATE)
+
+    # Returns (finished_segment, partial_text); finished_segment is None mid-utterance
+    def accept(self, pcm):
+        if self._recognizer.AcceptWaveform(pcm):
+            return json.loads(self._recognizer.Result()).get("text", ""), ""
+        return None, json.loads(self._recognizer.PartialResult()).get("partial", "")
+
+    def finish(self):
+        return json.loads(self._recognizer.FinalResult()).get("text", "")
+
+# Cloud recognizer kept for deployments without a local model; it has no partial results
+class GoogleBackend:
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def start(self):
+        self._buffer = bytearray()
+
+    def accept(self, pcm):
+        self._buffer.extend(pcm)
+        return None, ""
+
+    def finish(self):
+        import speech_recognition as sr
+        audio = sr.AudioData(bytes(self._buffer), SAMPLE_RATE, SAMPLE_WIDTH)
+        try:
+            return sr.Recognizer().recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+
+# Function to load the offline model; it is large, so callers should load it once and share it
+def load_vosk_model(model_path=VOSK_MODEL_PATH):
+    import vosk
+    return vosk.Model(model_path)
+
+# Function to create the configured recognizer backend
+def create_backend(name=SPEECH_BACKEND, vosk_model=None):
+    if name == "vosk":
+        return VoskBackend(vosk_model if vosk_model is not None else load_vosk_model())
+    if name == "google":
+        return GoogleBackend()
+    raise ValueError(f"Unknown speech backend: {name}")
+
+# Runs a backend on a worker thread so decoding overlaps with the speaker talking
+class StreamingTranscriber:
+    def __init__(self, backend):
+        self._backend = backend
+        self._chunks = queue.Queue()
+        self._lock = threading.Lock()
+        self._segments = []
+        self._partial = ""
+        self._final = None
+        self._error = None
+        self._backend.start()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                pcm = self._chunks.get()
+                if pcm is None:
+                    break
+                with metrics.timer("speech_seconds", step="accept"):
+                    segment, partial = self._backend.accept(pcm)
+                with self._lock:
+                    if segment:
+                        self._segments.append(segment)
+                    self._partial = partial
+            with metrics.timer("speech_seconds", step="finish"):
+                final = self._backend.finish()
+        except Exception as e:
+            final = ""
+            self._error = e
+        with self._lock:
+            if final:
+                self._segments.append(final)
+            self._partial = ""
+            self._final = " ".join(self._segments)
+
+    # Function to queue a chunk of 16 kHz mono s16 PCM for decoding
+    def feed(self, pcm):
+        if pcm:
+            self._chunks.put(pcm)
+
+    # Function to get the transcript so far, including the utterance still being spoken
+    def text(self):
+        with self._lock:
+            return " ".join(self._segments + ([self._partial] if self._partial else []))
+
+    # Function to flush remaining audio and wait for the final transcript
+    def stop(self, timeout=None):
+        self._chunks.put(None)
+        self._thread.join(timeout)
+        if self._error is not None:
+            raise self._error
+        with self._lock:
+            return self._final if self._final is not None else " ".join(self._segments)
+
+# Function to convert WebRTC audio frames to 16 kHz mono s16 PCM bytes
+def frames_to_pcm(frames, resampler):
+    pcm = bytearray()
+    for frame in frames:
+        for resampled in resampler.resample(frame):
+            pcm.extend(resampled.to_ndarray().tobytes())
+    return bytes(pcm)
+
+# Function to create the resampler used by frames_to_pcm
+def create_resampler():
+    import av
+    return av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+
+# Function to transcribe a recorded 16 kHz mono s16 WAV file, chunk by chunk as if it were live
+def transcribe_wav(file_path, backend=None, chunk_frames=4000):
+    with wave.open(file_path, "rb") as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError("WAV file must be 16 kHz mono 16-bit PCM")
+        transcriber = StreamingTranscriber(backend or create_backend())
+        while True:
+            pcm = wav.readframes(chunk_frames)
+            if not pcm:
+                break
+            transcriber.feed(pcm)
+    return transcriber.stop()
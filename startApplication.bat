@@ -27,6 +27,4 @@ if "%currentDate%" equ "%inputDate%" (
 )
 
 endlocal
-start "" "startPrediction.bat"
-echo Started Prediction Script...Moving on to Main Application
 streamlit run main.py --server.port 8000
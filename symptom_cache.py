@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+from symptoms import frame_to_sparse
+
+# Function to pack the indices of present symptoms into an integer bitmask (bit i = symptom column i)
+def pack_indices(indices):
+    mask = 0
+    for index in indices:
+        mask |= 1 << int(index)
+    return mask
+
+# Function to pack every row of a CSR symptom matrix into integer bitmasks
+def pack_sparse_rows(matrix):
+    indptr, indices = matrix.indptr, matrix.indices
+    return [pack_indices(indices[indptr[row]:indptr[row + 1]]) for row in range(matrix.shape[0])]
+
+# Bounded LRU cache of predictions keyed by symptom bitmask
+class PredictionCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, mask):
+        with self._lock:
+            if mask in self._entries:
+                self._entries.move_to_end(mask)
+                self.hits += 1
+                return self._entries[mask]
+            self.misses += 1
+            return None
+
+    def put(self, mask, value):
+        with self._lock:
+            self._entries[mask] = value
+            self._entries.move_to_end(mask)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    # Function to drop every entry, e.g. after the model behind them was replaced
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+# Function to pre-fill the cache with one prediction per distinct symptom pattern
+# predict maps a CSR symptom matrix to one cache value per row, e.g. pipeline.predict
+def warm_cache(cache, predict, symptom_columns, frames):
+    patterns = pd.concat([frame[symptom_columns] for frame in frames], ignore_index=True)
+    patterns = patterns.drop_duplicates().head(cache.maxsize)
+    if patterns.empty:
+        return 0
+    matrix = frame_to_sparse(patterns, symptom_columns)
+    predictions = predict(matrix)
+    for mask, prediction in zip(pack_sparse_rows(matrix), predictions):
+        cache.put(mask, prediction)
+    return len(patterns)
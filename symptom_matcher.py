@@ -0,0 +1,120 @@
+import argparse
+import csv
+import re
+from collections import deque
+
+# Extra spoken phrases for symptoms whose column names are not how people say them
+SYMPTOM_ALIASES = {
+    'skin_rash': ['rash', 'rashes'],
+    'continuous_sneezing': ['sneezing', 'sneezes'],
+    'joint_pain': ['joint ache', 'joints hurt', 'aching joints'],
+    'stomach_pain': ['stomach ache', 'stomachache', 'tummy ache'],
+    'vomiting': ['throwing up', 'vomit'],
+    'burning_micturition': ['burning urination', 'burning when i pee', 'burning while urinating'],
+    'fatigue': ['tired', 'tiredness', 'exhausted'],
+    'cold_hands_and_feets': ['cold hands and feet', 'cold hands', 'cold feet'],
+    'cough': ['coughing'],
+    'high_fever': ['high temperature'],
+    'breathlessness': ['shortness of breath', 'short of breath', 'difficulty breathing'],
+    'sweating': ['sweats'],
+    'headache': ['head ache', 'head hurts'],
+    'yellowish_skin': ['yellow skin'],
+    'nausea': ['nauseous', 'nauseated'],
+    'loss_of_appetite': ['not hungry', 'no appetite'],
+    'back_pain': ['backache', 'back ache'],
+    'diarrhoea': ['diarrhea', 'loose motions', 'loose stools'],
+    'mild_fever': ['slight fever', 'low fever'],
+    'yellowing_of_eyes': ['yellow eyes'],
+    'runny_nose': ['running nose'],
+    'chest_pain': ['chest hurts'],
+    'fast_heart_rate': ['racing heart', 'heart racing'],
+    'dizziness': ['dizzy'],
+    'swollen_legs': ['swelling in legs', 'legs are swollen'],
+    'neck_pain': ['neck hurts'],
+    'knee_pain': ['knee hurts'],
+    'muscle_pain': ['muscle ache', 'body ache', 'body aches'],
+    'belly_pain': ['belly ache'],
+    'palpitations': ['heart pounding'],
+    'blister': ['blisters'],
+}
+
+# Function to lowercase text and reduce it to single-space separated words
+def normalize_text(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+# Function to turn a column name like 'spotting_ urination' or 'fluid_overload.1' into a phrase
+def symptom_phrase(symptom):
+    return normalize_text(re.sub(r"\.\d+$", "", symptom).replace("_", " "))
+
+# Aho-Corasick automaton mapping spoken phrases to symptom columns in one pass over the text
+class SymptomMatcher:
+    def __init__(self, symptom_columns, aliases=SYMPTOM_ALIASES):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for symptom in symptom_columns:
+            self._add_phrase(symptom_phrase(symptom), symptom)
+            for alias in aliases.get(symptom, []):
+                self._add_phrase(normalize_text(alias), symptom)
+        self._build_failure_links()
+
+    def _add_phrase(self, phrase, symptom):
+        if not phrase:
+            return
+        # Surrounding spaces make every match fall on word boundaries
+        state = 0
+        for char in f" {phrase} ":
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].add(symptom)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    # Function to find every symptom mentioned in a transcript or note
+    def match(self, text):
+        found = set()
+        state = 0
+        for char in f" {normalize_text(text)} ":
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return found
+
+    # Function to extract symptoms from many free-text notes
+    def match_many(self, texts):
+        return [self.match(text) for text in texts]
+
+def main():
+    import model_store
+    parser = argparse.ArgumentParser(description="Extract symptoms from free-text intake notes (one note per line).")
+    parser.add_argument("input", help="text file with one intake note per line")
+    parser.add_argument("output", help="CSV file to write note,symptoms rows to")
+    args = parser.parse_args()
+
+    symptom_columns = model_store.load_data(model_store.TRAINING_DATA).columns.drop("prognosis")
+    matcher = SymptomMatcher(symptom_columns)
+    with open(args.input, encoding="utf-8") as notes, open(args.output, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(["note", "symptoms"])
+        for note in notes:
+            note = note.rstrip("\n")
+            writer.writerow([note, ";".join(sorted(matcher.match(note)))])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import re
+import numpy as np
+from scipy import sparse
+
+# Function to map each symptom name to its column index
+def build_symptom_index(symptom_columns):
+    return {symptom: index for index, symptom in enumerate(symptom_columns)}
+
+# Function to turn one symptom selection into sorted column indices
+# Accepts symptom names, column indices or a dense 0/1 vector over all columns
+def symptom_indices(symptoms, symptom_index):
+    if sparse.issparse(symptoms):
+        return np.sort(sparse.csr_matrix(symptoms).indices)
+    if not isinstance(symptoms, (set, frozenset)) and len(symptoms) == len(symptom_index) \
+            and all(value in (0, 1, True, False) for value in symptoms):
+        return np.flatnonzero(np.asarray(symptoms, dtype=bool))
+    indices = set()
+    for symptom in symptoms:
+        if isinstance(symptom, str):
+            if symptom not in symptom_index:
+                raise KeyError(f"Unknown symptom: {symptom}")
+            indices.add(symptom_index[symptom])
+        else:
+            index = int(symptom)
+            if not 0 <= index < len(symptom_index):
+                raise IndexError(f"Symptom index out of range: {index}")
+            indices.add(index)
+    return np.array(sorted(indices), dtype=np.int32)
+
+# Function to encode many symptom selections as one CSR matrix
+def to_sparse_matrix(symptom_sets, symptom_index):
+    rows = [symptom_indices(symptoms, symptom_index) for symptoms in symptom_sets]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    indices = np.concatenate(rows).astype(np.int32) if rows else np.zeros(0, dtype=np.int32)
+    data = np.ones(len(indices), dtype=np.float64)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(symptom_index)))
+
+# Function to encode one symptom selection as a 1-row CSR matrix
+def to_sparse(symptoms, symptom_index):
+    return to_sparse_matrix([symptoms], symptom_index)
+
+# Function to convert a dense symptom frame (e.g. Training.csv rows) into a CSR matrix
+# Rows are converted a block at a time in the frame's own dtype (uint8 for the datasets), so no dense float64 copy is made
+def frame_to_sparse(frame, symptom_columns, chunksize=10000):
+    blocks = [
+        sparse.csr_matrix(frame.iloc[start:start + chunksize][symptom_columns].to_numpy())
+        for start in range(0, len(frame), chunksize)
+    ]
+    if not blocks:
+        return sparse.csr_matrix((0, len(symptom_columns)), dtype=np.float64)
+    return sparse.vstack(blocks, format="csr", dtype=np.float64)
+
+# Body-system groups used to lay out the symptom selector; columns not listed here fall under "Other"
+SYMPTOM_GROUPS = {
+    "Fever and general": [
+        "shivering", "chills", "fatigue", "weight_gain", "weight_loss", "restlessness", "lethargy",
+        "high_fever", "mild_fever", "sweating", "dehydration", "malaise", "toxic_look_(typhos)", "obesity",
+        "excessive_hunger", "increased_appetite", "loss_of_appetite", "cold_hands_and_feets",
+        "irregular_sugar_level",
+    ],
+    "Skin, hair and nails": [
+        "itching", "skin_rash", "nodal_skin_eruptions", "yellowish_skin", "bruising", "brittle_nails",
+        "red_spots_over_body", "dischromic _patches", "pus_filled_pimples", "blackheads", "scurring",
+        "skin_peeling", "silver_like_dusting", "small_dents_in_nails", "inflammatory_nails", "blister",
+        "red_sore_around_nose", "yellow_crust_ooze", "internal_itching",
+    ],
+    "Head, eyes, nose and throat": [
+        "headache", "continuous_sneezing", "patches_in_throat", "ulcers_on_tongue", "sunken_eyes",
+        "pain_behind_the_eyes", "yellowing_of_eyes", "blurred_and_distorted_vision", "throat_irritation",
+        "redness_of_eyes", "sinus_pressure", "runny_nose", "congestion", "puffy_face_and_eyes",
+        "enlarged_thyroid", "drying_and_tingling_lips", "loss_of_smell", "watering_from_eyes",
+        "visual_disturbances",
+    ],
+    "Chest, breathing and heart": [
+        "cough", "breathlessness", "phlegm", "chest_pain", "fast_heart_rate", "mucoid_sputum",
+        "rusty_sputum", "blood_in_sputum", "palpitations",
+    ],
+    "Stomach and digestion": [
+        "stomach_pain", "acidity", "vomiting", "indigestion", "nausea", "constipation", "abdominal_pain",
+        "diarrhoea", "acute_liver_failure", "fluid_overload", "swelling_of_stomach",
+        "pain_during_bowel_movements", "pain_in_anal_region", "bloody_stool", "irritation_in_anus",
+        "passage_of_gases", "belly_pain", "stomach_bleeding", "distention_of_abdomen",
+    ],
+    "Urinary and menstrual": [
+        "burning_micturition", "spotting_ urination", "dark_urine", "yellow_urine", "bladder_discomfort",
+        "foul_smell_of urine", "continuous_feel_of_urine", "polyuria", "abnormal_menstruation",
+    ],
+    "Muscles, joints and limbs": [
+        "joint_pain", "muscle_wasting", "back_pain", "neck_pain", "cramps", "knee_pain", "hip_joint_pain",
+        "muscle_weakness", "stiff_neck", "swelling_joints", "movement_stiffness", "muscle_pain",
+        "painful_walking", "weakness_in_limbs", "swollen_legs", "swollen_blood_vessels",
+        "swollen_extremeties", "prominent_veins_on_calf", "swelled_lymph_nodes",
+    ],
+    "Nervous system and mood": [
+        "anxiety", "mood_swings", "dizziness", "slurred_speech", "spinning_movements", "loss_of_balance",
+        "unsteadiness", "weakness_of_one_body_side", "depression", "irritability", "altered_sensorium",
+        "lack_of_concentration", "coma",
+    ],
+    "History and exposure": [
+        "extra_marital_contacts", "family_history", "receiving_blood_transfusion",
+        "receiving_unsterile_injections", "history_of_alcohol_consumption",
+    ],
+}
+
+# Function to map each group name to its symptom columns, in SYMPTOM_GROUPS order with "Other" last
+def group_symptoms(symptom_columns, groups=SYMPTOM_GROUPS):
+    group_of = {symptom: group for group, symptoms in groups.items() for symptom in symptoms}
+    grouped = {group: [] for group in groups}
+    for symptom in symptom_columns:
+        # Repeated CSV headers come back as e.g. 'fluid_overload.1'; they belong with the original column
+        grouped.setdefault(group_of.get(re.sub(r"\.\d+$", "", symptom), "Other"), []).append(symptom)
+    return {group: symptoms for group, symptoms in grouped.items() if symptoms}
@@ -0,0 +1,10 @@
+import db
+
+# The hot queries in db.py must be answered from their indexes on a freshly migrated database
+def test_hot_queries_use_their_indexes(tmp_path):
+    conn = db.connect(str(tmp_path / "healthcare.db"))
+    try:
+        db.create_schema(conn)
+        assert db.check_query_plans(conn) == []
+    finally:
+        conn.close()
@@ -0,0 +1,18 @@
+import json
+import os
+import subprocess
+import sys
+
+LOAD_TEST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "load_test.py")
+
+# Smoke run with the default processes and threads: a harness that hangs fails here on the timeout
+def test_default_load_test_finishes(tmp_path):
+    output = tmp_path / "load_test.json"
+    subprocess.run([sys.executable, LOAD_TEST, "--duration", "1", "--output", str(output)],
+                   cwd=tmp_path, timeout=180, check=True, capture_output=True)
+    results = json.loads(output.read_text())
+    assert results["processes"] == 2 and results["threads_per_process"] == 8
+    assert results["total"]["count"] > 0
+    assert results["total"]["error_rate"] == 0
+    # Every write, presence included, goes to the load test's own temporary database
+    assert not list(tmp_path.glob("healthcare.db*"))
@@ -0,0 +1,47 @@
+import threading
+from notifications import MessageBroker
+
+# Two simulated sessions block on the same conversation; one publish wakes both
+def test_wait_wakes_every_subscriber_on_publish():
+    broker = MessageBroker()
+    subscriptions = [broker.subscribe("doctor1:patient1") for _ in range(2)]
+    waiting = threading.Barrier(3)
+    woken = [None, None]
+
+    def session(i):
+        waiting.wait()
+        woken[i] = subscriptions[i].wait(timeout=5)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    waiting.wait()
+    broker.publish("doctor1:patient1")
+    for thread in threads:
+        thread.join(10)
+    assert woken == [True, True]
+    # The news was consumed by wait, so a poll right after finds nothing
+    assert not any(subscription.poll() for subscription in subscriptions)
+
+def test_poll_is_false_when_nothing_happened():
+    broker = MessageBroker()
+    subscription = broker.subscribe("doctor1:patient1")
+    assert not subscription.poll()
+    assert not subscription.wait(timeout=0.05)
+    broker.publish("doctor1:patient1")
+    assert subscription.poll()
+    assert not subscription.poll()
+
+# Sessions watching another conversation are not told about this one
+def test_other_conversations_are_not_notified():
+    broker = MessageBroker()
+    watched = broker.subscribe("doctor1:patient1")
+    other = broker.subscribe("doctor2:patient2")
+    result = []
+    thread = threading.Thread(target=lambda: result.append(other.wait(timeout=0.2)))
+    thread.start()
+    broker.publish("doctor1:patient1")
+    thread.join(5)
+    assert result == [False]
+    assert not other.poll()
+    assert watched.poll()
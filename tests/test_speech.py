@@ -0,0 +1,66 @@
+import time
+import wave
+import numpy as np
+import pytest
+import speech
+
+# Offline stand-in for a recognizer: every other chunk ends a segment, the ones between leave a partial result
+class StubBackend:
+    def __init__(self):
+        self.chunk_bytes = []
+
+    def start(self):
+        self.chunk_bytes = []
+
+    def accept(self, pcm):
+        self.chunk_bytes.append(len(pcm))
+        count = len(self.chunk_bytes)
+        if count % 2 == 0:
+            return f"segment{count}", ""
+        return None, f"partial{count}"
+
+    def finish(self):
+        return "tail"
+
+# Function to write a recorded-audio fixture: a tone as 16-bit mono PCM
+def write_wav(path, seconds=1.0, rate=speech.SAMPLE_RATE):
+    samples = (np.sin(np.arange(int(rate * seconds)) * 2 * np.pi * 440 / rate) * 8000).astype(np.int16)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(speech.SAMPLE_WIDTH)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+# Function to wait until the transcriber's worker thread has caught up
+def wait_for_text(transcriber, expected, timeout=5):
+    deadline = time.monotonic() + timeout
+    while transcriber.text() != expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return transcriber.text()
+
+# Recorded audio is fed in chunks and the transcript joins every finished segment with the final result
+def test_transcribe_wav_fixture(tmp_path):
+    backend = StubBackend()
+    text = speech.transcribe_wav(write_wav(tmp_path / "symptoms.wav"), backend, chunk_frames=4000)
+    assert text == "segment2 segment4 tail"
+    assert backend.chunk_bytes == [4000 * speech.SAMPLE_WIDTH] * 4
+
+# While audio streams in, text() shows the finished segments plus the utterance still being decoded
+def test_streaming_partials(tmp_path):
+    with wave.open(write_wav(tmp_path / "symptoms.wav"), "rb") as wav:
+        chunks = [wav.readframes(4000) for _ in range(3)]
+    transcriber = speech.StreamingTranscriber(StubBackend())
+    transcriber.feed(chunks[0])
+    assert wait_for_text(transcriber, "partial1") == "partial1"
+    transcriber.feed(chunks[1])
+    assert wait_for_text(transcriber, "segment2") == "segment2"
+    transcriber.feed(chunks[2])
+    assert wait_for_text(transcriber, "segment2 partial3") == "segment2 partial3"
+    assert transcriber.stop(timeout=5) == "segment2 tail"
+
+def test_rejects_wrong_sample_rate(tmp_path):
+    backend = StubBackend()
+    with pytest.raises(ValueError):
+        speech.transcribe_wav(write_wav(tmp_path / "phone.wav", rate=8000), backend)
+    assert backend.chunk_bytes == []
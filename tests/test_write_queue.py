@@ -0,0 +1,46 @@
+import sqlite3
+import pytest
+import db
+from write_queue import WriteQueue
+
+# Function to create a migrated database with the write queue in front of it
+def open_queue(tmp_path, **kwargs):
+    db_file = str(tmp_path / "healthcare.db")
+    conn = db.connect(db_file)
+    db.create_schema(conn)
+    conn.close()
+    return WriteQueue(db_file, **kwargs)
+
+def test_unopenable_database_fails_at_startup(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        WriteQueue(str(tmp_path / "missing" / "healthcare.db"))
+
+def test_write_commits(tmp_path):
+    writes = open_queue(tmp_path)
+    assert writes.write("INSERT INTO users (username, password_hash, user_type) VALUES (?, ?, ?)", ("pat", "x", "Patient")) == 1
+    writes.close(timeout=5)
+
+# A writer thread that dies must fail the write that broke it and every later one instead of leaving callers waiting
+def test_dead_writer_fails_pending_and_new_writes(tmp_path):
+    writes = open_queue(tmp_path)
+
+    def broken_commit(conn, batch):
+        raise RuntimeError("disk gone")
+
+    writes._commit = broken_commit
+    with pytest.raises(RuntimeError):
+        writes.write("UPDATE users SET is_logged_in=0", timeout=5)
+    with pytest.raises(sqlite3.OperationalError, match="Write queue stopped"):
+        writes.write("UPDATE users SET is_logged_in=0", timeout=5)
+
+def test_write_times_out(tmp_path):
+    writes = open_queue(tmp_path, write_timeout=0.2)
+    blocker = db.connect(writes.db_file)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="not committed"):
+            writes.write("UPDATE users SET is_logged_in=0")
+    finally:
+        blocker.rollback()
+        blocker.close()
+    writes.close(timeout=10)
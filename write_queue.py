@@ -0,0 +1,141 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from itertools import groupby
+import db
+
+# Write-behind queue: one writer thread commits pending writes together in a single transaction
+class WriteQueue:
+    def __init__(self, db_file, max_batch_size=256, max_delay_ms=5, write_timeout=10):
+        self.db_file = db_file
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.write_timeout = write_timeout
+        self.transactions = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        # Opened here so a bad path fails at startup instead of killing the writer thread
+        self._conn = db.connect(db_file)
+        self._stopped = None
+        self._stop_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    # Function to queue one statement; the returned Future resolves once it is committed
+    def submit(self, sql, params=()):
+        return self.submit_many(sql, [params])
+
+    # Function to queue one statement for many parameter rows, committed together
+    def submit_many(self, sql, rows):
+        future = Future()
+        with self._stop_lock:
+            if self._stopped is not None:
+                future.set_exception(self._stopped)
+            else:
+                self._queue.put((sql, list(rows), future))
+        return future
+
+    # Function to queue one statement and wait for its commit, at most write_timeout seconds by default
+    def write(self, sql, params=(), timeout=None):
+        return self.write_many(sql, [params], timeout)
+
+    def write_many(self, sql, rows, timeout=None):
+        timeout = self.write_timeout if timeout is None else timeout
+        try:
+            return self.submit_many(sql, rows).result(timeout)
+        except FutureTimeoutError:
+            raise sqlite3.OperationalError(f"Write not committed after {timeout} s") from None
+
+    # Function to wait until everything queued so far has been committed
+    def flush(self, timeout=None):
+        self.submit_many(None, []).result(timeout)
+
+    def close(self, timeout=None):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        conn = self._conn
+        error = None
+        try:
+            while True:
+                batch = [self._queue.get()]
+                if batch[0] is None:
+                    break
+                deadline = time.monotonic() + self.max_delay
+                stop = False
+                while len(batch) < self.max_batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                try:
+                    self._commit(conn, batch)
+                except Exception as e:
+                    # Not a failed statement (those are reported per write) but a broken writer
+                    error = e
+                    self._fail(batch, e)
+                    break
+                if stop:
+                    break
+        finally:
+            conn.close()
+            self._stop(error)
+
+    # Function to refuse new writes and fail every write still queued, so no caller waits on a dead writer
+    def _stop(self, error):
+        stopped = sqlite3.OperationalError(f"Write queue stopped: {error}" if error else "Write queue closed")
+        with self._stop_lock:
+            self._stopped = stopped
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._fail([item], stopped)
+
+    def _fail(self, batch, error):
+        for item in batch:
+            if not item[2].done():
+                item[2].set_exception(error)
+
+    def _commit(self, conn, batch):
+        writes = [item for item in batch if item[0] is not None]
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Consecutive writes of the same statement go through a single executemany
+            for sql, items in groupby(writes, key=lambda item: item[0]):
+                conn.executemany(sql, [row for item in items for row in item[1]])
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            # Retry one by one so a single bad write does not fail the rest of the batch
+            for item in writes:
+                self._commit_one(conn, item)
+        else:
+            self.transactions += 1
+            for item in writes:
+                item[2].set_result(len(item[1]))
+        self.writes += len(writes)
+        for item in batch:
+            if item[0] is None:
+                item[2].set_result(0)
+
+    def _commit_one(self, conn, item):
+        sql, rows, future = item
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(sql, rows)
+            conn.commit()
+            self.transactions += 1
+            future.set_result(len(rows))
+        except sqlite3.Error as e:
+            conn.rollback()
+            future.set_exception(e)